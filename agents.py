@@ -1,7 +1,12 @@
 import time
 import os
+import re
 import logging
 import json
+import urllib.error
+import urllib.request
+
+from llm_scheduler import RateLimitError, TransientModelError
 
 # --- LOGGING SETUP ---
 logging.basicConfig(
@@ -19,12 +24,36 @@ try:
         # Load the entire JSON and then extract the 'advisors' part
         system_prompts_data = json.load(f)
         ADVISOR_DEFINITIONS = system_prompts_data.get('advisors', {}).get('personas', {})
+        # Situation Room report prompts (SITREP, SIGACTS, ORBAT, ...), keyed by report name
+        SITUATION_PROMPTS = system_prompts_data.get('situation_reports', {}).get('prompts', {})
 except FileNotFoundError:
     logger.error(f"{ADVISOR_DEFINITIONS_PATH} not found. Advisor definitions cannot be loaded.")
     ADVISOR_DEFINITIONS = {}
+    SITUATION_PROMPTS = {}
 except json.JSONDecodeError:
     logger.error(f"Error decoding JSON from {ADVISOR_DEFINITIONS_PATH}. Check file format.")
     ADVISOR_DEFINITIONS = {}
+    SITUATION_PROMPTS = {}
+
+# Keys each generated artifact is stored under in intelligence_analysis.json
+# (see prompts/generate_responses_prompt.txt); the web app's pages look these up.
+REPORT_KEYS = {
+    "SITREP": "report_SITREP",
+    "SIGACTS": "report_SIGACTS",
+    "ORBAT": "report_ORBAT",
+    "DECISION_LOG": "report_Actions",
+    "RED_DILEMMAS": "report_Dilemmas",
+    "Uncertainties": "report_Uncertainties",
+    "Geospatial": "report_Geospatial",
+}
+BRIEFING_KEYS = {
+    "integrator": "briefing_Integrator",
+    "historian": "briefing_Military Historian",
+    "alliance_whisperer": "briefing_Alliance_Whisperer",
+    "red_teamer": "briefing_Red Teamer",
+    "missing_link": "briefing_The Missing Link",
+    "citizens_voice": "briefing_Citizen's Voice",
+}
 
 # --- VERTEX AI IMPORTS (COMMENTED OUT FOR COST SAVINGS) ---
 # To re-enable LLM functionality, uncomment the following lines:
@@ -36,13 +65,42 @@ except json.JSONDecodeError:
 PROJECT_ID = "ai-wargamer" 
 LOCATION = "us-central1"
 MODEL_ID = "gemini-3.0" 
+# Optional HTTP model endpoint for static reports, e.g. the local stand-in started with
+# `python stub_model_server.py` (http://127.0.0.1:8089/v1/generate). Unset = mock mode.
+MODEL_ENDPOINT = os.environ.get("WARGAME_MODEL_ENDPOINT")
+MODEL_MAX_OUTPUT_TOKENS = 2048
+# Mock mode streams its placeholder answer at this many chunks (words) per second,
+# so the streaming UI can be exercised without a model. 0 disables the delay.
+MOCK_STREAM_CHUNKS_PER_SECOND = float(os.environ.get("WARGAME_MOCK_STREAM_RATE", "40"))
+
+def call_model_endpoint(system_prompt, prompt, max_tokens=MODEL_MAX_OUTPUT_TOKENS, timeout=300):
+    """
+    Calls MODEL_ENDPOINT and returns the generated text. Quota rejections raise
+    RateLimitError and server/network failures raise TransientModelError, so the
+    scheduler (llm_scheduler.py) can back off and retry them.
+    """
+    payload = json.dumps({"system_prompt": system_prompt, "prompt": prompt, "max_tokens": max_tokens}).encode('utf-8')
+    request = urllib.request.Request(MODEL_ENDPOINT, data=payload, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())["text"]
+    except urllib.error.HTTPError as e:
+        if e.code == 429:
+            retry_after = e.headers.get("Retry-After")
+            raise RateLimitError(f"{MODEL_ENDPOINT} returned 429", float(retry_after) if retry_after else None)
+        if e.code >= 500:
+            raise TransientModelError(f"{MODEL_ENDPOINT} returned {e.code}")
+        raise
+    except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+        raise TransientModelError(f"{MODEL_ENDPOINT} unreachable: {e}")
 
 # --- WargameAgent Class ---
 class WargameAgent:
-    def __init__(self, name, icon, system_prompt):
+    def __init__(self, name, icon, system_prompt, mock_chunk_rate=None):
         self.name = name
         self.icon = icon
         self.system_prompt = system_prompt
+        self.mock_chunk_rate = MOCK_STREAM_CHUNKS_PER_SECOND if mock_chunk_rate is None else mock_chunk_rate
         
         # --- LLM INITIALIZATION (COMMENTED OUT) ---
         # To re-enable, uncomment the following:
@@ -75,6 +133,9 @@ class WargameAgent:
         """
         Used for the 'Situation Room' static reports (now mocked).
         """
+        if MODEL_ENDPOINT:
+            return call_model_endpoint(self.system_prompt, f"CONTEXT:\n{context_text}\n\nTASK: {task_type}")
+
         logger.info(f"Mock mode: Generating static report for {self.name} / {task_type}")
         time.sleep(1.0) # Simulate a slight delay
 
@@ -99,31 +160,158 @@ class WargameAgent:
         * **Recommendation:** Prioritize political signaling over military action in the next 12 hours.
         """
 
-    def get_response(self, user_input, context_text=""):
+    def stream_response(self, user_input, context_text=""):
         """
         Used for the 'Advisor' chatbot interaction (now mocked).
+        Yields the answer as text chunks as soon as they are available, so the first
+        words can be shown while the rest is still being generated.
         """
-        logger.info(f"Mock mode: Getting chat response for {self.name}")
-        # Simulate LLM delay
-        time.sleep(1.5)
-        
+        logger.info(f"Mock mode: Streaming chat response for {self.name}")
+
         # --- LLM CODE (COMMENTED OUT) ---
         # if self.model and self.chat_session:
         #     try:
         #         # Pass the raw transcript context to the LLM for RAG-like capability
         #         full_prompt = f"CONTEXT:\n{context_text}\n\nUSER QUERY:\n{user_input}"
-        #         response = self.chat_session.send_message(full_prompt)
-        #         return response.text
+        #         for chunk in self.chat_session.send_message(full_prompt, stream=True):
+        #             yield chunk.text
+        #         return
         #     except Exception as e:
         #         logger.error(f"LLM Call Error: {e}")
-        #         return f"**[LLM ERROR]** An error occurred while communicating with the AI. Check project logs. Falling back to mock response."
-        
+        #         yield f"**[LLM ERROR]** An error occurred while communicating with the AI. Check project logs. Falling back to mock response."
+        #         return
+
+        # Emit the mock response word by word (keeping its whitespace) at the configured rate.
+        interval = 1.0 / self.mock_chunk_rate if self.mock_chunk_rate > 0 else 0
+        for i, chunk in enumerate(re.findall(r'\s*\S+\s*', self._mock_response(user_input))):
+            if i and interval:
+                time.sleep(interval)
+            yield chunk
+
+    def get_response(self, user_input, context_text=""):
+        """
+        Used for the 'Advisor' chatbot interaction (now mocked).
+        Blocking variant of stream_response that returns the complete answer.
+        """
+        return "".join(self.stream_response(user_input, context_text=context_text))
+
+    def _mock_response(self, user_input):
         # A static, non-LLM mock response for the Chatbot
         return f"**[MOCK RESPONSE - {self.name}]**\n\nI am currently operating in **LLM-FREE MODE**.\n\nYour query ('{user_input}') is understood.\n\nAs the **{self.name}**, my advice is currently locked to a placeholder message to ensure zero Vertex AI token usage. To enable the live AI capability, you will need to **uncomment the Vertex AI import and initialization code** in the `agents.py` file."
 
 
 
 
+# --- PRECOMPUTE GENERATORS (Situation Room reports and advisor briefings) ---
+MOCK_EMPTY_KML = """<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2"><Document><name>Mock GEOINT</name></Document></kml>"""
+MOCK_MARKERS = ("[MOCK STATIC REPORT", "[MOCK RESPONSE")
+
+def using_mock_model():
+    """True when precompute outputs are placeholders (no model endpoint configured)."""
+    return not MODEL_ENDPOINT
+
+def model_backend():
+    """Identifies the model that answers ("mock" when no endpoint is configured)."""
+    return f"{MODEL_ID}@{MODEL_ENDPOINT}" if MODEL_ENDPOINT else "mock"
+
+def is_mock_output(text):
+    """True for the placeholder reports, briefings and chat answers produced in mock mode."""
+    return isinstance(text, str) and (text == MOCK_EMPTY_KML or any(marker in text for marker in MOCK_MARKERS))
+
+def generate_situation_report(report_name, context_text):
+    """
+    Generates one Situation Room report from the transcript context (now mocked).
+    """
+    definition = SITUATION_PROMPTS[report_name]
+    agent = WargameAgent(definition.get('role', report_name), "", definition['system_prompt'])
+    if report_name == "Geospatial" and agent.model is None and not MODEL_ENDPOINT:
+        # The GEOINT page parses this report as KML; keep the mock well-formed.
+        logger.info(f"Mock mode: Generating static report for {agent.name} / {report_name}")
+        return MOCK_EMPTY_KML
+    return agent.analyze_situation(context_text, task_type=report_name)
+
+def update_situation_report(report_name, previous_report, new_transcript_text):
+    """
+    Produces the next episode's report from the previous episode's report plus only the
+    new episode's transcript, so cost scales with new material (now mocked).
+    """
+    definition = SITUATION_PROMPTS[report_name]
+    agent = WargameAgent(definition.get('role', report_name), "", definition['system_prompt'])
+    if report_name == "Geospatial" and agent.model is None and not MODEL_ENDPOINT:
+        logger.info(f"Mock mode: Updating static report for {agent.name} / {report_name}")
+        return MOCK_EMPTY_KML
+    delta_context = (
+        "PREVIOUS REPORT (covers all earlier episodes):\n"
+        f"{previous_report}\n\n"
+        "NEW TRANSCRIPT SEGMENTS (this episode only):\n"
+        f"{new_transcript_text}\n\n"
+        "Update the previous report with the new segments. Keep its structure, revise anything "
+        "the new material supersedes, and add new items; do not drop still-valid earlier content."
+    )
+    return agent.analyze_situation(delta_context, task_type=f"{report_name} (update)")
+
+def generate_advisor_briefing(advisor_id, context_text):
+    """
+    Generates an advisor's initial strategic assessment from the transcript context (now mocked).
+    """
+    agent = get_agent(advisor_id)
+    if agent is None:
+        raise KeyError(f"Unknown advisor: {advisor_id}")
+    return agent.analyze_situation(context_text, task_type="briefing")
+
+
+# --- EPISODE SUMMARIES (Long-range context) ---
+# Word budgets keep summaries, and therefore late-episode prompts, roughly constant in size.
+EPISODE_SUMMARY_WORDS = 400
+CUMULATIVE_SUMMARY_WORDS = 1200
+
+def _extractive_summary(lines, max_words):
+    """Mock summariser: keeps the most substantive lines, in their original order, within max_words."""
+    ranked = sorted(range(len(lines)), key=lambda i: len(lines[i].split()), reverse=True)
+    kept, used = set(), 0
+    for i in ranked:
+        words = len(lines[i].split())
+        if used + words > max_words:
+            continue
+        kept.add(i)
+        used += words
+    return "\n".join(lines[i] for i in sorted(kept))
+
+def generate_episode_summary(episode, episode_text):
+    """
+    Summarises one episode's transcript (now mocked with an extractive summary).
+    """
+    logger.info(f"Mock mode: Summarising episode {episode}")
+
+    # --- LLM CODE (COMMENTED OUT) ---
+    # model = GenerativeModel(MODEL_ID)
+    # prompt = (f"Summarise episode {episode} of the wargame transcript below in at most "
+    #           f"{EPISODE_SUMMARY_WORDS} words. Keep decisions, attacks, and shifts in alliance positions.\n\n{episode_text}")
+    # return model.generate_content(prompt).text
+
+    lines = [line for line in episode_text.splitlines() if line.strip() and not line.startswith("---")]
+    return _extractive_summary(lines, EPISODE_SUMMARY_WORDS)
+
+def generate_cumulative_summary(previous_summary, episode, episode_summary):
+    """
+    Folds an episode summary into the rolling summary of all earlier episodes (now mocked).
+    """
+    logger.info(f"Mock mode: Updating cumulative summary with episode {episode}")
+
+    # --- LLM CODE (COMMENTED OUT) ---
+    # model = GenerativeModel(MODEL_ID)
+    # prompt = (f"Merge the story-so-far summary with the episode {episode} summary into a single summary "
+    #           f"of at most {CUMULATIVE_SUMMARY_WORDS} words, compressing older events more.\n\n"
+    #           f"STORY SO FAR:\n{previous_summary}\n\nEPISODE {episode}:\n{episode_summary}")
+    # return model.generate_content(prompt).text
+
+    # Older material is compressed harder: the newest episode keeps half the budget.
+    merged = _extractive_summary(previous_summary.splitlines(), CUMULATIVE_SUMMARY_WORDS // 2) if previous_summary else ""
+    latest = _extractive_summary(episode_summary.splitlines(), CUMULATIVE_SUMMARY_WORDS - len(merged.split()))
+    return f"{merged}\n\nEPISODE {episode}:\n{latest}".strip()
+
+
 def get_agent(agent_name):
     """Factory function to create an agent instance."""
     if agent_name in ADVISOR_DEFINITIONS:
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_FORMAT = "content-addressed/v1"
+HASH_LENGTH = 16  # Hex digits of sha256 kept as the key; ample for thousands of bodies
+
+
+def content_hash(body):
+    """Truncated sha256 of a report/briefing body, used as its storage key."""
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()[:HASH_LENGTH]
+
+
+def pack_analysis(episodes):
+    """
+    Converts {"episode_N": {key: body}} into the content-addressed layout:
+    each distinct body is stored once under its hash in "blobs", and each
+    episode maps its keys to hashes.
+    """
+    blobs = {}
+    packed_episodes = {}
+    for episode_key, reports in episodes.items():
+        packed = {}
+        for key, body in reports.items():
+            if not isinstance(body, str):
+                body = json.dumps(body)
+            digest = content_hash(body)
+            blobs.setdefault(digest, body)
+            packed[key] = digest
+        packed_episodes[episode_key] = packed
+    return {"format": ANALYSIS_FORMAT, "blobs": blobs, "episodes": packed_episodes}
+
+
+def unpack_analysis(document):
+    """
+    Converts a stored document back into {"episode_N": {key: body}}. Identical bodies
+    resolve to the same string object, so memory grows with unique content only.
+    Legacy documents (episode keys mapping straight to bodies) are returned as-is.
+    """
+    if document.get("format") is None:
+        return {k: v for k, v in document.items() if isinstance(v, dict)}
+    if document.get("format") != ANALYSIS_FORMAT:
+        raise ValueError(f"Unsupported analysis format: {document.get('format')}")
+
+    blobs = document.get("blobs", {})
+    episodes = {}
+    for episode_key, packed in document.get("episodes", {}).items():
+        reports = {}
+        for key, digest in packed.items():
+            if digest in blobs:
+                reports[key] = blobs[digest]
+            else:
+                logger.warning(f"Missing blob {digest[:12]} for {episode_key}/{key}")
+        episodes[episode_key] = reports
+    return episodes
+
+
+def load_analysis_document(path):
+    """Reads the raw stored document (content-addressed or legacy)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_analysis(path):
+    """Reads an analysis file and returns {"episode_N": {key: body}}."""
+    return unpack_analysis(load_analysis_document(path))
+
+
+def save_analysis(path, episodes):
+    """Writes {"episode_N": {key: body}} in the content-addressed layout (atomically)."""
+    document = pack_analysis(episodes)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2)
+    os.replace(tmp_path, path)
+    logger.info(
+        f"Saved {sum(len(r) for r in episodes.values())} entries across {len(episodes)} episodes "
+        f"as {len(document['blobs'])} unique bodies to {path}"
+    )
+    return document
+
+
+if __name__ == "__main__":
+    # Converts an existing analysis file (legacy or current) to the content-addressed layout.
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    target = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intelligence_analysis.json")
+    save_analysis(target, load_analysis(target))
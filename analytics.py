@@ -0,0 +1,116 @@
+import time
+import logging
+
+import numpy as np
+import pandas as pd
+
+from transcript_store import word_counts
+
+logger = logging.getLogger(__name__)
+
+# Dimensions the dashboard can break airtime down by (column -> label).
+ANALYTICS_FIELDS = {
+    "classification": "Classification",
+    "identified_role": "Role",
+    "identified_speaker": "Speaker",
+}
+METRICS = ("words", "seconds", "turns")
+UNKNOWN_LABEL = "Unknown"
+# Words-per-turn histogram bins; the last bin collects everything longer.
+TURN_LENGTH_BINS = np.array([0, 10, 25, 50, 100, 200, 400, 800])
+
+
+class TranscriptAnalytics:
+    """
+    Speaker/role/classification aggregates over the columnar transcript table, computed once
+    and shared by every session.
+
+    Every aggregate is stored per episode (episode x category), so any view the dashboard
+    offers ("episode N" or "episodes 1..N") is a lookup or a cumulative sum over a table
+    whose size depends on the number of episodes and categories, not on the number of
+    transcript rows.
+    """
+
+    def __init__(self, table):
+        started = time.perf_counter()
+        frame = table.select(["episode_number", *ANALYTICS_FIELDS]).to_pandas()
+        for field in ANALYTICS_FIELDS:
+            column = frame[field].astype("category")
+            if UNKNOWN_LABEL not in column.cat.categories:
+                column = column.cat.add_categories([UNKNOWN_LABEL])
+            frame[field] = column.fillna(UNKNOWN_LABEL)
+        frame["words"] = word_counts(table).to_numpy(zero_copy_only=False)
+        duration = table.column("end").to_numpy(zero_copy_only=False) - table.column("start").to_numpy(zero_copy_only=False)
+        frame["seconds"] = np.clip(np.nan_to_num(duration), 0, None)
+        self.episodes = sorted(int(ep) for ep in frame["episode_number"].unique())
+
+        # A speaking turn is a run of consecutive segments by the same speaker within an episode.
+        speaker_codes = frame["identified_speaker"].cat.codes.to_numpy()
+        episode_numbers = frame["episode_number"].to_numpy()
+        new_turn = np.ones(len(frame), dtype=bool)
+        new_turn[1:] = (speaker_codes[1:] != speaker_codes[:-1]) | (episode_numbers[1:] != episode_numbers[:-1])
+        frame["turns"] = new_turn.astype(np.int64)
+        turn_ids = np.cumsum(new_turn) - 1
+        turn_words = np.bincount(turn_ids, weights=frame["words"].to_numpy(), minlength=int(new_turn.sum()))
+        turn_starts = np.flatnonzero(new_turn)
+
+        # Per-episode aggregates: {field: DataFrame indexed by (episode_number, category)}
+        self.per_episode = {
+            field: frame.groupby(["episode_number", field], observed=True)[list(METRICS)].sum()
+            for field in ANALYTICS_FIELDS
+        }
+
+        # Turn length histograms per (episode, classification of the turn's first segment)
+        turns = pd.DataFrame({
+            "episode_number": episode_numbers[turn_starts],
+            "classification": frame["classification"].to_numpy()[turn_starts],
+            "bin": np.digitize(turn_words, TURN_LENGTH_BINS[1:]),
+        })
+        self.turn_histogram = turns.groupby(["episode_number", "classification", "bin"], observed=True).size()
+
+        logger.info(
+            f"Transcript analytics built: {len(frame)} segments, {len(turn_starts)} turns "
+            f"in {(time.perf_counter() - started) * 1000:.0f} ms."
+        )
+
+    def by_episode(self, field, metric):
+        """DataFrame of metric per episode (rows) and category (columns)."""
+        return self.per_episode[field][metric].unstack(fill_value=0).reindex(self.episodes, fill_value=0)
+
+    def cumulative(self, field, metric):
+        """Running totals of metric across episodes, per category."""
+        return self.by_episode(field, metric).cumsum()
+
+    def totals(self, field, up_to_episode=None, episode=None):
+        """
+        Words/seconds/turns per category, for one episode or summed over episodes 1..up_to_episode,
+        sorted by words. Includes each category's share of total words.
+        """
+        data = self.per_episode[field]
+        episodes = data.index.get_level_values("episode_number")
+        if episode is not None:
+            data = data[episodes == episode]
+        elif up_to_episode is not None:
+            data = data[episodes <= up_to_episode]
+        totals = data.groupby(level=field, observed=True).sum().sort_values("words", ascending=False)
+        totals = totals[totals["words"] > 0]
+        return totals.assign(
+            share=totals["words"] / max(int(totals["words"].sum()), 1),
+            seconds=totals["seconds"].round(1),
+        )
+
+    def turn_length_distribution(self, up_to_episode=None, episode=None):
+        """Number of speaking turns per words-per-turn bin (rows) and classification (columns)."""
+        data = self.turn_histogram
+        episodes = data.index.get_level_values("episode_number")
+        if episode is not None:
+            data = data[episodes == episode]
+        elif up_to_episode is not None:
+            data = data[episodes <= up_to_episode]
+        labels = [
+            f"{low}-{high - 1}" for low, high in zip(TURN_LENGTH_BINS[:-1], TURN_LENGTH_BINS[1:])
+        ] + [f"{TURN_LENGTH_BINS[-1]}+"]
+        distribution = data.groupby(level=["bin", "classification"], observed=True).sum().unstack(fill_value=0)
+        distribution = distribution.reindex(range(len(labels)), fill_value=0)
+        distribution.index = pd.Index(labels, name="words per turn")
+        return distribution
@@ -0,0 +1,215 @@
+import json
+import os
+import struct
+import logging
+import threading
+
+import numpy as np
+import pyarrow as pa
+
+from analysis_store import load_analysis_document, pack_analysis, unpack_analysis
+from transcript_store import (
+    discover_transcript_files, source_fingerprint, load_transcript_table,
+    episode_end_offsets, word_counts, viewer_corpus,
+)
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BUNDLE_FILE = "wargame.bundle"
+PRECOMPUTED_FILE = "intelligence_analysis.json"
+REPORT_PREFIX = "report_"
+GEOSPATIAL_KEY = "report_Geospatial"
+
+# Layout: MAGIC | uint64 header length | JSON header | sections (each 64-byte aligned).
+# The header maps section names to {"offset", "length", "codec"} plus small indexes, so
+# readers can decode just the section a page asks for straight out of the memory map.
+MAGIC = b"WGBNDL01"
+ALIGNMENT = 64
+
+
+def bundle_sources(base_dir=BASE_DIR):
+    """Files the bundle is compiled from; their fingerprint marks the bundle stale when they change."""
+    sources = discover_transcript_files(os.path.join(base_dir, 'data')) + [os.path.join(base_dir, PRECOMPUTED_FILE)]
+    # Pre-rendered maps reference the vendored libraries, so re-vendoring rebuilds them
+    vendor_manifest = os.path.join(base_dir, "static", "vendor", "manifest.json")
+    if os.path.exists(vendor_manifest):
+        sources.append(vendor_manifest)
+    return sources
+
+
+def _arrow_file_bytes(table):
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def compile_bundle(base_dir=BASE_DIR, output_file=BUNDLE_FILE):
+    """
+    Packs transcripts, reports, briefings and pre-rendered assets into one indexed file.
+    Sections:
+      transcripts       Arrow IPC file of every clean transcript segment
+      viewer/corpus     JSON payload for the transcript viewer component
+      blobs/<hash>      each unique report/briefing body (utf-8)
+      html/<hash>       formatted HTML for each unique report body (see report_formatting.py)
+      maps/<kml hash>   pre-rendered GEOINT map HTML for each distinct KML body, referencing
+                        the vendored map libraries where vendor_assets.py has fetched them
+    """
+    from geospatial import build_kml_map, kml_content_hash
+    from report_formatting import format_llm_output
+
+    data_dir = os.path.join(base_dir, 'data')
+    sections = []
+
+    table = load_transcript_table(data_dir)
+    sections.append(("transcripts", "arrow", _arrow_file_bytes(table)))
+
+    corpus_hash, corpus = viewer_corpus(table)
+    sections.append(("viewer/corpus", "json", json.dumps(corpus, separators=(',', ':')).encode('utf-8')))
+
+    document = pack_analysis(unpack_analysis(load_analysis_document(os.path.join(base_dir, PRECOMPUTED_FILE))))
+    for digest, body in document["blobs"].items():
+        sections.append((f"blobs/{digest}", "utf8", body.encode('utf-8')))
+
+    report_hashes = {
+        digest for reports in document["episodes"].values()
+        for key, digest in reports.items() if key.startswith(REPORT_PREFIX) and key != GEOSPATIAL_KEY
+    }
+    for digest in sorted(report_hashes):
+        sections.append((f"html/{digest}", "utf8", format_llm_output(document["blobs"][digest]).encode('utf-8')))
+
+    kml_hashes = {reports[GEOSPATIAL_KEY] for reports in document["episodes"].values() if GEOSPATIAL_KEY in reports}
+    for digest in sorted(kml_hashes):
+        body = document["blobs"][digest]
+        if body:
+            try:
+                _, map_html = build_kml_map(body, vendored=True)
+                sections.append((f"maps/{kml_content_hash(body)}", "utf8", map_html.encode('utf-8')))
+            except Exception as e:
+                logger.warning(f"Skipping map pre-render: {e}")
+
+    offsets = episode_end_offsets(table)
+    cumulative = np.concatenate([[0], np.cumsum(word_counts(table).to_numpy())])
+    header = {
+        "version": 1,
+        "source_fingerprint": source_fingerprint(bundle_sources(base_dir)),
+        "episode_end_offsets": {str(ep): end for ep, end in offsets.items()},
+        "cumulative_word_counts": {str(ep): int(cumulative[end]) for ep, end in offsets.items()},
+        "viewer_corpus_hash": corpus_hash,
+        "analysis_index": document["episodes"],
+        "sections": {},
+    }
+
+    # Section offsets depend on the header size, so repeat the layout until it is stable.
+    def layout(header_size):
+        position = _align(len(MAGIC) + 8 + header_size)
+        for name, codec, payload in sections:
+            header["sections"][name] = {"offset": position, "length": len(payload), "codec": codec}
+            position = _align(position + len(payload))
+        return json.dumps(header).encode('utf-8')
+
+    header_size = len(layout(0))
+    while True:
+        header_bytes = layout(header_size)
+        if len(header_bytes) <= header_size:
+            # Pad to the size the offsets were computed for (trailing spaces are valid JSON).
+            header_bytes = header_bytes.ljust(header_size)
+            break
+        header_size = len(header_bytes)
+
+    output_path = os.path.join(base_dir, output_file)
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        for name, _, payload in sections:
+            f.write(b"\0" * (header["sections"][name]["offset"] - f.tell()))
+            f.write(payload)
+    os.replace(tmp_path, output_path)
+    logger.info(f"Wrote {len(sections)} sections ({os.path.getsize(output_path) / 1e6:.2f} MB) to {output_path}")
+    return output_path
+
+
+def _align(position):
+    return (position + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class WargameBundle:
+    """
+    Read-only view over a compiled bundle. The file is memory-mapped and sections are
+    decoded only when first requested; decoded text is kept so repeat reads are free.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._mmap = pa.memory_map(path, 'r')
+        self._buffer = self._mmap.read_buffer()
+        if self._buffer.slice(0, len(MAGIC)).to_pybytes() != MAGIC:
+            raise ValueError(f"{path} is not a wargame bundle")
+        (header_length,) = struct.unpack('<Q', self._buffer.slice(len(MAGIC), 8).to_pybytes())
+        self.header = json.loads(self._buffer.slice(len(MAGIC) + 8, header_length).to_pybytes())
+        self.sections = self.header["sections"]
+        self._decoded = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open_if_fresh(cls, base_dir=BASE_DIR, bundle_file=BUNDLE_FILE):
+        """Opens the bundle if it exists and was compiled from the current sources, else None."""
+        path = os.path.join(base_dir, bundle_file)
+        if not os.path.exists(path):
+            return None
+        try:
+            bundle = cls(path)
+        except (ValueError, OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable bundle {path}: {e}")
+            return None
+        if bundle.header.get("source_fingerprint") != source_fingerprint(bundle_sources(base_dir)):
+            logger.warning(f"{bundle_file} is stale; loading from source files. Run `python bundle.py` to refresh it.")
+            return None
+        return bundle
+
+    def has(self, name):
+        return name in self.sections
+
+    def read_buffer(self, name):
+        """Zero-copy view of a section's bytes inside the memory map."""
+        section = self.sections[name]
+        return self._buffer.slice(section["offset"], section["length"])
+
+    def read(self, name):
+        """Decodes a section according to its codec, caching the result."""
+        with self._lock:
+            if name in self._decoded:
+                return self._decoded[name]
+        codec = self.sections[name]["codec"]
+        buffer = self.read_buffer(name)
+        if codec == "arrow":
+            value = pa.ipc.open_file(buffer).read_all()
+        elif codec == "json":
+            value = json.loads(buffer.to_pybytes())
+        else:
+            value = buffer.to_pybytes().decode('utf-8')
+        with self._lock:
+            self._decoded.setdefault(name, value)
+            return self._decoded[name]
+
+    def episode_end_offsets(self):
+        return {int(ep): end for ep, end in self.header["episode_end_offsets"].items()}
+
+    def cumulative_word_counts(self):
+        return {int(ep): count for ep, count in self.header["cumulative_word_counts"].items()}
+
+    def decoded_bytes(self):
+        """Approximate memory held by decoded sections (mapped pages are not counted)."""
+        total = 0
+        with self._lock:
+            for value in self._decoded.values():
+                total += len(value) if isinstance(value, str) else 0
+        return total
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    compile_bundle()
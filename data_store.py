@@ -0,0 +1,316 @@
+import json
+import os
+import sys
+import logging
+import threading
+from collections.abc import Mapping
+from types import MappingProxyType
+
+import numpy as np
+
+from analysis_store import content_hash, load_analysis
+from analytics import TranscriptAnalytics
+from bundle import WargameBundle
+from knowledge_graph import GRAPH_FILE, ENTITIES_FILE, load_graph, load_entities, assemble_graph, update_graph
+from report_formatting import format_report_html
+from retrieval import TranscriptRetriever
+from search_index import SearchIndex
+from transcript_store import load_transcript_table, episode_end_offsets, word_counts, viewer_corpus
+
+logger = logging.getLogger(__name__)
+
+PRECOMPUTED_FILE = "intelligence_analysis.json"
+
+
+def deep_getsizeof(obj, exclude_ids=frozenset(), _seen=None):
+    """
+    Approximates the memory held by an object graph in bytes.
+    Objects whose id is in exclude_ids (e.g. data owned by the shared store) are not counted,
+    so a session view that only references shared data reports just its own overhead.
+    """
+    if _seen is None:
+        _seen = set()
+    obj_id = id(obj)
+    if obj_id in _seen or obj_id in exclude_ids:
+        return 0
+    _seen.add(obj_id)
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool)) or obj is None:
+        return size
+    if isinstance(obj, (dict, MappingProxyType)):
+        for key, value in obj.items():
+            size += deep_getsizeof(key, exclude_ids, _seen)
+            size += deep_getsizeof(value, exclude_ids, _seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += deep_getsizeof(item, exclude_ids, _seen)
+    return size
+
+
+class BundleReports(Mapping):
+    """Read-only report mapping for one episode that decodes bodies from the bundle on access."""
+
+    def __init__(self, bundle, hashes):
+        self._bundle = bundle
+        self.hashes = hashes
+
+    def __getitem__(self, key):
+        return self._bundle.read(f"blobs/{self.hashes[key]}")
+
+    def __iter__(self):
+        return iter(self.hashes)
+
+    def __len__(self):
+        return len(self.hashes)
+
+
+class WargameDataStore:
+    """
+    Immutable, process-wide store for the transcripts and precomputed analysis.
+    Built once per server process and shared by every browser session; sessions should
+    only hold references into it (selected episode, page, chat history), never copies.
+
+    Backed either by the compiled bundle (see bundle.py), in which case every piece is
+    decoded from the memory map on first use, or by the source files directly.
+    """
+
+    def __init__(self, analysis, analysis_error=None, transcripts=None, bundle=None):
+        self.bundle = bundle
+        self.analysis = MappingProxyType({
+            episode_key: reports if isinstance(reports, BundleReports) else MappingProxyType(dict(reports))
+            for episode_key, reports in analysis.items()
+            if isinstance(reports, (dict, BundleReports))
+        })
+        self.analysis_error = analysis_error
+        self._transcripts = transcripts
+        self._transcripts_lock = threading.Lock()
+        self._shared_ids = None
+        self._transcript_corpus = None
+        self._retriever = None
+        self._retriever_lock = threading.Lock()
+        self._search_index = None
+        self._search_index_lock = threading.Lock()
+        self._analytics = None
+        self._analytics_lock = threading.Lock()
+        self._graph_sources = None
+        self._graph_views = {}
+        self._graph_lock = threading.Lock()
+        self._prefix_views = {}
+
+        if bundle is not None:
+            # The episode index is precomputed in the bundle header, so no table scan is needed.
+            self.episode_end_offsets = bundle.episode_end_offsets()
+            self.cumulative_word_counts = bundle.cumulative_word_counts()
+        else:
+            self._build_episode_index()
+        self.max_episode = max(self.episode_end_offsets)
+
+    @property
+    def transcripts(self):
+        """Columnar (Arrow) transcript table; decoded from the bundle on first access."""
+        if self._transcripts is None:
+            with self._transcripts_lock:
+                if self._transcripts is None:
+                    self._transcripts = self.bundle.read("transcripts")
+        return self._transcripts
+
+    def _build_episode_index(self):
+        """
+        Records, for each episode N, the end offset of its rows and the cumulative word
+        count of episodes 1..N. Because rows are episode-ordered, "everything up to
+        episode N" is then the zero-copy prefix slice transcripts[:end_offsets[N]].
+        """
+        self.episode_end_offsets = episode_end_offsets(self.transcripts)
+        cumulative = np.concatenate([[0], np.cumsum(word_counts(self.transcripts).to_numpy())])
+        self.cumulative_word_counts = {
+            ep: int(cumulative[offset]) for ep, offset in self.episode_end_offsets.items()
+        }
+
+    def _resolve_episode(self, episode):
+        """Maps a requested episode to the latest indexed episode at or before it."""
+        episode = min(episode, self.max_episode)
+        while episode > 0 and episode not in self.episode_end_offsets:
+            episode -= 1
+        return max(episode, 0)
+
+    @classmethod
+    def load(cls, base_dir):
+        """Opens the compiled bundle if it is fresh, otherwise loads from the source files."""
+        bundle = WargameBundle.open_if_fresh(base_dir)
+        if bundle is not None:
+            analysis = {
+                episode_key: BundleReports(bundle, hashes)
+                for episode_key, hashes in bundle.header["analysis_index"].items()
+            }
+            store = cls(analysis, bundle=bundle)
+            logger.info(f"Shared data store opened from {bundle.path} ({len(bundle.sections)} sections, decoded on demand).")
+            return store
+        return cls.from_sources(base_dir)
+
+    @classmethod
+    def from_sources(cls, base_dir):
+        """Memory-maps the compiled transcripts and reads the precomputed analysis from disk."""
+        transcripts = load_transcript_table(os.path.join(base_dir, 'data'))
+
+        analysis_data = {}
+        analysis_error = None
+        precomputed_path = os.path.join(base_dir, PRECOMPUTED_FILE)
+        if os.path.exists(precomputed_path):
+            try:
+                analysis_data = load_analysis(precomputed_path)
+            except Exception as e:
+                analysis_error = f"Error reading {PRECOMPUTED_FILE}: {e}"
+        else:
+            analysis_error = f"Precomputed analysis file not found: {precomputed_path}"
+            logger.warning(analysis_error)
+
+        store = cls(analysis_data, analysis_error, transcripts=transcripts)
+        logger.info(
+            f"Shared data store built: {store.transcripts.num_rows} transcript segments, "
+            f"{len(store.analysis)} episodes of analysis, ~{store.memory_bytes() / 1e6:.1f} MB."
+        )
+        return store
+
+    @property
+    def analysis_loaded(self):
+        return self.analysis_error is None and bool(self.analysis)
+
+    def get_episode_analysis(self, episode):
+        """Returns the read-only report mapping for an episode (empty if missing)."""
+        return self.analysis.get(f"episode_{episode}", MappingProxyType({}))
+
+    def get_report(self, episode, key, default=None):
+        return self.get_episode_analysis(episode).get(key, default)
+
+    def get_report_html(self, episode, key):
+        """
+        Returns a report formatted for display, or None if the episode has no such report.
+        Uses the HTML pre-rendered into the bundle when available, otherwise formats it
+        once per process (see report_formatting.format_report_html).
+        """
+        reports = self.get_episode_analysis(episode)
+        if key not in reports:
+            return None
+        if isinstance(reports, BundleReports):
+            html = self.get_asset(f"html/{reports.hashes[key]}")
+            if html is not None:
+                return html
+        return format_report_html(reports[key])
+
+    def get_asset(self, name):
+        """Returns a pre-rendered asset from the bundle (e.g. "maps/<kml hash>"), or None."""
+        if self.bundle is not None and self.bundle.has(name):
+            return self.bundle.read(name)
+        return None
+
+    def transcripts_up_to(self, episode):
+        """
+        Returns the transcript rows for episodes 1..episode as a zero-copy table slice.
+        Prefix views are built once per episode and shared, so repeat calls are a dict lookup.
+        """
+        episode = self._resolve_episode(episode)
+        view = self._prefix_views.get(episode)
+        if view is None:
+            view = self.transcripts.slice(0, self.episode_end_offsets[episode])
+            self._prefix_views[episode] = view
+        return view
+
+    def transcript_corpus(self):
+        """Returns (content_hash, payload) for the browser transcript viewer, built once."""
+        if self._transcript_corpus is None:
+            if self.bundle is not None:
+                self._transcript_corpus = (self.bundle.header["viewer_corpus_hash"], self.bundle.read("viewer/corpus"))
+            else:
+                self._transcript_corpus = viewer_corpus(self.transcripts)
+        return self._transcript_corpus
+
+    def retriever(self):
+        """BM25 index over all transcript segments, built on first use and shared."""
+        if self._retriever is None:
+            with self._retriever_lock:
+                if self._retriever is None:
+                    self._retriever = TranscriptRetriever(self.transcripts)
+        return self._retriever
+
+    def search_index(self):
+        """Full-text index over transcripts and report/briefing bodies, built on first use and shared."""
+        if self._search_index is None:
+            with self._search_index_lock:
+                if self._search_index is None:
+                    self._search_index = SearchIndex.from_store(self)
+        return self._search_index
+
+    def analytics(self):
+        """Per-episode speaker/role/classification aggregates, computed on first use and shared."""
+        if self._analytics is None:
+            with self._analytics_lock:
+                if self._analytics is None:
+                    self._analytics = TranscriptAnalytics(self.transcripts)
+        return self._analytics
+
+    def knowledge_graph(self, episode):
+        """
+        Returns (content_hash, {"nodes", "edges"}) for the knowledge graph as of an episode,
+        assembled from the per-episode deltas in knowledge_graph.json once per episode and
+        shared. The deltas are counted on first use if the file has not been generated yet.
+        Returns None if they cannot be.
+        """
+        episode = self._resolve_episode(episode)
+        with self._graph_lock:
+            if self._graph_sources is None:
+                if os.path.exists(GRAPH_FILE):
+                    document = load_graph(GRAPH_FILE)
+                else:
+                    logger.info(f"{GRAPH_FILE} not found; counting it now (`python knowledge_graph.py` refreshes it).")
+                    try:
+                        document = update_graph()
+                    except (OSError, ValueError) as e:
+                        logger.warning(f"Could not generate the knowledge graph: {e}")
+                        return None
+                self._graph_sources = (document, load_entities(ENTITIES_FILE))
+            view = self._graph_views.get(episode)
+            if view is None:
+                graph = assemble_graph(*self._graph_sources, episode)
+                encoded = json.dumps(graph, sort_keys=True, separators=(',', ':'))
+                view = self._graph_views[episode] = (content_hash(encoded), graph)
+        return view
+
+    def word_count_up_to(self, episode):
+        """Total transcript words for episodes 1..episode."""
+        return self.cumulative_word_counts[self._resolve_episode(episode)]
+
+    # --- MEMORY ACCOUNTING ---
+
+    def shared_ids(self):
+        """Ids of every object owned by the store, used to exclude shared data from session sizes."""
+        if self._shared_ids is None:
+            ids = set()
+            stack = [self.analysis]
+            while stack:
+                obj = stack.pop()
+                if id(obj) in ids:
+                    continue
+                ids.add(id(obj))
+                if isinstance(obj, (dict, MappingProxyType)):
+                    stack.extend(obj.keys())
+                    stack.extend(obj.values())
+                elif isinstance(obj, (list, tuple)):
+                    stack.extend(obj)
+            self._shared_ids = frozenset(ids)
+        return self._shared_ids
+
+    def memory_bytes(self):
+        """
+        Approximate size of the shared store (paid once per process). With a bundle
+        this only counts what has been decoded so far, not the mapped file.
+        """
+        if self.bundle is not None:
+            transcripts_bytes = self._transcripts.nbytes if self._transcripts is not None else 0
+            return transcripts_bytes + self.bundle.decoded_bytes()
+        return self.transcripts.nbytes + deep_getsizeof(self.analysis)
+
+    def session_memory_bytes(self, session_items):
+        """Approximate memory held by one session on top of the shared store."""
+        exclude_ids = self.shared_ids() | {id(self._transcripts)} | {id(view) for view in self._prefix_views.values()}
+        return deep_getsizeof(dict(session_items), exclude_ids=exclude_ids)
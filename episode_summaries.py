@@ -0,0 +1,87 @@
+import json
+import os
+import logging
+
+from analysis_store import content_hash
+from game_state import GameStateManager, SUMMARY_FILE
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FORMAT = "episode-summaries/v1"
+
+# Layout of episode_summaries.json (stored next to intelligence_analysis.json):
+# {"format": ..., "episodes": {"N": {
+#     "source_hash":        hash of episode N's transcript text the summary was made from,
+#     "summary":            summary of episode N alone,
+#     "cumulative_hash":    hash of (previous cumulative_hash, source_hash),
+#     "cumulative_summary": rolling summary of episodes 1..N}}}
+# An entry is regenerated only when its hash no longer matches, so editing one episode
+# re-summarises that episode and re-folds the rolling summaries after it.
+
+
+def load_summaries(path=SUMMARY_FILE):
+    """Reads the summaries document, or an empty one if it does not exist or is unreadable."""
+    if not os.path.exists(path):
+        return {"format": SUMMARY_FORMAT, "episodes": {}}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            document = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Ignoring unreadable summaries file {path}: {e}")
+        return {"format": SUMMARY_FORMAT, "episodes": {}}
+    if document.get("format") != SUMMARY_FORMAT:
+        logger.warning(f"Ignoring summaries file {path} with unsupported format {document.get('format')}")
+        return {"format": SUMMARY_FORMAT, "episodes": {}}
+    return document
+
+
+def save_summaries(document, path=SUMMARY_FILE):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def update_summaries(manager=None, path=SUMMARY_FILE):
+    """
+    Brings the per-episode and rolling summaries up to date with the transcripts,
+    regenerating only the entries whose source changed. Returns the document.
+    """
+    from agents import generate_episode_summary, generate_cumulative_summary
+
+    manager = manager or GameStateManager()
+    document = load_summaries(path)
+    stored = document["episodes"]
+    updated = {}
+    previous = {"cumulative_hash": "", "cumulative_summary": ""}
+    regenerated = 0
+
+    for episode in sorted(manager.episodes):
+        text = manager.get_episode_text(episode)
+        source_hash = content_hash(text)
+        entry = dict(stored.get(str(episode), {}))
+
+        if entry.get("source_hash") != source_hash:
+            entry["summary"] = generate_episode_summary(episode, text)
+            entry["source_hash"] = source_hash
+            regenerated += 1
+
+        cumulative_hash = content_hash(previous["cumulative_hash"] + source_hash)
+        if entry.get("cumulative_hash") != cumulative_hash:
+            entry["cumulative_summary"] = generate_cumulative_summary(
+                previous["cumulative_summary"], episode, entry["summary"]
+            )
+            entry["cumulative_hash"] = cumulative_hash
+
+        updated[str(episode)] = entry
+        previous = entry
+
+    document = {"format": SUMMARY_FORMAT, "episodes": updated}
+    save_summaries(document, path)
+    logger.info(f"Episode summaries up to date ({regenerated} of {len(updated)} episodes regenerated) in {path}")
+    return document
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    update_summaries()
@@ -1,65 +1,203 @@
-import json
 import os
+import logging
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from analysis_store import content_hash
+from transcript_store import (
+    TRANSCRIPT_STORE_FILE, discover_transcript_files, episode_number_from_path, file_fingerprint,
+    open_transcript_store, build_transcript_table, classification_mask, episode_end_offsets,
+)
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "episode_summaries.json")
 
 class GameStateManager:
     def __init__(self, data_dir="data"):
         self.data_dir = data_dir
-        self.episodes = {}
+        self.episode_files = {}
+        # Memoized per-episode tables and texts, and cumulative contexts; each entry
+        # records the mtimes it was built from and is rebuilt when a source file changes.
+        self._tables = {}
+        self._episode_texts = {}
+        self._contexts = {}
+        self._fresh_summaries = {}
+        self._store = None
+        self._store_mtime = None
         self.load_data()
 
     def load_data(self):
-        """Loads all cleaned transcript JSONs from the data directory."""
-        # Assuming file naming convention: the_wargame_s2e{N}_transcript_cleaned.json
-        # In a real app, use glob or os.listdir
-        episode_files = [
-            (1, "the_wargame_s2e1_transcript_cleaned.json"),
-            (2, "the_wargame_s2e2_transcript_cleaned.json"),
-            (3, "the_wargame_s2e3_transcript_cleaned.json"),
-            # Add ep 4 and 5 when ready
-        ]
-
-        for ep_num, filename in episode_files:
-            path = os.path.join(self.data_dir, filename)
-            if os.path.exists(path):
-                with open(path, 'r', encoding='utf-8') as f:
-                    self.episodes[ep_num] = json.load(f)
+        """
+        Discovers the episode transcript files (clean_transcript_s2e*.json or .jsonl) by glob.
+        Nothing is parsed here; each episode is loaded the first time it is needed.
+        """
+        self.episode_files = {
+            episode_number_from_path(path): path for path in discover_transcript_files(self.data_dir)
+        }
+
+    @property
+    def episodes(self):
+        """Episode numbers available, in order."""
+        return sorted(self.episode_files)
+
+    def _mtime(self, episode):
+        return os.stat(self.episode_files[episode]).st_mtime_ns
+
+    def _compiled_store(self):
+        """The memory-mapped compiled store (see transcript_store.py), reopened if it was rebuilt."""
+        store_path = os.path.join(self.data_dir, TRANSCRIPT_STORE_FILE)
+        mtime = os.stat(store_path).st_mtime_ns if os.path.exists(store_path) else None
+        if mtime != self._store_mtime:
+            self._store = open_transcript_store(self.data_dir) if mtime is not None else (None, frozenset())
+            self._store_mtime = mtime
+        return self._store or (None, frozenset())
+
+    def get_episode_table(self, episode: int):
+        """
+        Returns one episode's rows as a table, or None if the episode does not exist.
+        Sliced zero-copy from the compiled store when it is current for that episode's file,
+        otherwise parsed from the episode's JSON alone.
+        """
+        if episode not in self.episode_files:
+            return None
+        path = self.episode_files[episode]
+        mtime = self._mtime(episode)
+        cached = self._tables.get(episode)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        table, fingerprint_parts = self._compiled_store()
+        if table is not None and file_fingerprint(path) in fingerprint_parts:
+            offsets = episode_end_offsets(table)
+            previous = max((end for ep, end in offsets.items() if ep < episode), default=0)
+            data = table.slice(previous, offsets.get(episode, previous) - previous)
+        else:
+            data = build_transcript_table(self.data_dir, paths=[path])
+
+        self._tables[episode] = (mtime, data)
+        return data
+
+    def get_episode_text(self, episode: int, include_types=None):
+        """
+        Returns one episode's transcript as "[LABEL]: text" lines between episode markers,
+        or "" if the episode does not exist. include_types works as in get_transcript_context.
+        """
+        if episode not in self.episode_files:
+            return ""
+        key = (episode, tuple(sorted(include_types)) if include_types else None)
+        mtime = self._mtime(episode)
+        cached = self._episode_texts.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        data = self.get_episode_table(episode)
+
+        # Filter logic (vectorised over the classification column)
+        if include_types:
+            mask = classification_mask(data, include_types=include_types)
+        else:
+            mask = classification_mask(data, exclude_types=['advertisement'])
+        segments = data.filter(mask)
+
+        # Format: [BLUE]: Content...
+        speaker_labels = pc.fill_null(pc.utf8_upper(segments.column('classification').cast(pa.string())), "UNKNOWN")
+        lines = pc.binary_join_element_wise(
+            "[", speaker_labels, "]: ", pc.fill_null(segments.column('text'), ""), ""
+        )
+
+        context_text = [f"--- START OF EPISODE {episode} ---"]
+        context_text.extend(lines.to_pylist())
+        context_text.append(f"--- END OF EPISODE {episode} ---\n")
+        text = "\n".join(context_text)
+        self._episode_texts[key] = (mtime, text)
+        return text
 
     def get_transcript_context(self, up_to_episode: int, include_types=None):
         """
         Concatenates transcript content up to a specific episode.
-        
+
         Args:
             up_to_episode (int): The current episode state (e.g., 2 includes Ep 1 & 2).
-            include_types (list): Filters like ['blue', 'red', 'explanation']. 
+            include_types (list): Filters like ['blue', 'red', 'explanation'].
                                   If None, includes everything except 'advertisement'.
+
+        Memoized per (up_to_episode, include_types) against the episode files' mtimes, and
+        built incrementally: episode N's context extends the memoized context of the
+        previous available episode.
+        """
+        types_key = tuple(sorted(include_types)) if include_types else None
+        included = [i for i in self.episodes if 1 <= i <= up_to_episode]
+        if not included:
+            return ""
+
+        mtimes = tuple(self._mtime(i) for i in included)
+        cached = self._contexts.get((included[-1], types_key))
+        if cached is not None and cached[0] == mtimes:
+            return cached[1]
+
+        current = self.get_episode_text(included[-1], include_types)
+        if len(included) > 1:
+            context = self.get_transcript_context(included[-2], include_types) + "\n" + current
+        else:
+            context = current
+        self._contexts[(included[-1], types_key)] = (mtimes, context)
+        return context
+
+    def get_agent_context(self, episode: int, include_types=None, summary_file=SUMMARY_FILE):
         """
-        context_text = []
-        
-        for i in range(1, up_to_episode + 1):
-            if i not in self.episodes:
-                continue
-                
-            data = self.episodes[i]
-            context_text.append(f"--- START OF EPISODE {i} ---")
-            
-            for segment in data.get('segments', []):
-                seg_type = segment.get('type')
-                
-                # Filter logic
-                if include_types and seg_type not in include_types:
-                    continue
-                
-                # Format: [Blue Team]: "Content..."
-                speaker_label = seg_type.upper() if seg_type else "UNKNOWN"
-                content = segment.get('content', '')
-                
-                # Add to context buffer
-                context_text.append(f"[{speaker_label}]: {content}")
-                
-            context_text.append(f"--- END OF EPISODE {i} ---\n")
-            
-        return "\n".join(context_text)
+        Context for the precomputed reports and briefings at an episode: the rolling summary
+        of episodes 1..N-1 followed by the full text of episode N, so prompt size stays roughly
+        flat as the game goes on. (Advisor chat retrieves passages per question instead, see
+        retrieval.py.)
+        Falls back to the full text of earlier episodes if their summaries are missing or stale
+        (see episode_summaries.py).
+        """
+        current = self.get_episode_text(episode, include_types)
+        if episode <= 1:
+            return current
+
+        previous = self._fresh_summary(episode - 1, summary_file)
+        if previous is None:
+            logger.warning(
+                f"Episode summaries before episode {episode} are missing or stale; using full transcripts. "
+                f"Run `python episode_summaries.py` to refresh them."
+            )
+            return self.get_transcript_context(episode, include_types)
+
+        return (
+            f"--- SUMMARY OF EPISODES 1-{episode - 1} ---\n"
+            f"{previous['cumulative_summary']}\n"
+            f"--- END OF SUMMARY ---\n\n"
+            f"{current}"
+        )
+
+    def _fresh_summary(self, episode, summary_file=SUMMARY_FILE):
+        """
+        The summary entry covering episodes 1..episode, or None if it is missing or any of
+        those episodes changed since it was written. Memoized against the summary file's and
+        the episode files' mtimes, so the transcripts are only re-hashed when one changes.
+        """
+        from episode_summaries import load_summaries
+
+        included = [i for i in self.episodes if i <= episode]
+        summary_mtime = os.stat(summary_file).st_mtime_ns if os.path.exists(summary_file) else None
+        fingerprint = (summary_mtime, tuple(self._mtime(i) for i in included))
+        cached = self._fresh_summaries.get((episode, summary_file))
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+
+        entries = load_summaries(summary_file).get("episodes", {})
+        entry = entries.get(str(episode))
+        fresh = entry is not None and all(
+            entries.get(str(i), {}).get("source_hash") == content_hash(self.get_episode_text(i))
+            for i in included
+        )
+        self._fresh_summaries[(episode, summary_file)] = (fingerprint, entry if fresh else None)
+        return entry if fresh else None
 
 # Usage Example:
 # manager = GameStateManager()
-# context = manager.get_transcript_context(up_to_episode=2, include_types=['blue', 'red', 'explanation'])
\ No newline at end of file
+# context = manager.get_transcript_context(up_to_episode=2, include_types=['blue', 'red', 'explanation'])
+# agent_context = manager.get_agent_context(episode=4)
@@ -0,0 +1,102 @@
+import hashlib
+import logging
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+
+import folium
+
+from bounded_cache import BoundedCache
+from vendor_assets import vendored_assets
+
+logger = logging.getLogger(__name__)
+
+# KML files use a namespace, we need to handle it to find tags
+KML_NAMESPACE = {'kml': 'http://www.opengis.net/kml/2.2'}
+MAX_CACHED_MAPS = 16
+
+Placemark = namedtuple("Placemark", ["name", "description", "lat", "lon"])
+
+_placemark_cache = BoundedCache(MAX_CACHED_MAPS)
+_map_html_cache = BoundedCache(MAX_CACHED_MAPS)
+
+
+def kml_content_hash(kml_content):
+    return hashlib.sha256(kml_content.strip().encode('utf-8')).hexdigest()
+
+
+def parse_kml_placemarks(kml_content):
+    """
+    Parses KML text into a tuple of Placemarks, cached by content hash.
+    Raises ET.ParseError if the KML is not valid XML.
+    """
+    key = kml_content_hash(kml_content)
+    placemarks = _placemark_cache.get(key)
+    if placemarks is not None:
+        return placemarks
+
+    # Remove any leading whitespace/newlines before parsing
+    root = ET.fromstring(kml_content.strip())
+
+    parsed = []
+    for placemark in root.findall('.//kml:Placemark', KML_NAMESPACE):
+        # Extract Name
+        name_tag = placemark.find('kml:name', KML_NAMESPACE)
+        name = name_tag.text if name_tag is not None else "Unknown Location"
+
+        # Extract Description
+        desc_tag = placemark.find('kml:description', KML_NAMESPACE)
+        description = desc_tag.text if desc_tag is not None else ""
+
+        # Extract Coordinates
+        point = placemark.find('.//kml:Point/kml:coordinates', KML_NAMESPACE)
+        if point is not None:
+            coords_str = point.text.strip()
+            try:
+                # KML is Longitude,Latitude,Altitude
+                lon_str, lat_str, _ = coords_str.split(',')
+                parsed.append(Placemark(name, description, float(lat_str), float(lon_str)))
+            except ValueError:
+                logger.warning(f"Skipping placemark '{name}': Invalid coordinates format.")
+
+    placemarks = tuple(parsed)
+    _placemark_cache.put(key, placemarks)
+    return placemarks
+
+
+def build_kml_map(kml_content, vendored=False):
+    """
+    Returns (placemarks, map_html) for KML text, where map_html is a complete Folium
+    HTML document with one marker per placemark. Both are cached by content hash, so
+    re-rendering identical KML is a dictionary lookup.
+
+    With vendored=True the Leaflet/Bootstrap scripts and stylesheets are referenced from
+    the app's static route (see vendor_assets.py) instead of the CDNs; map tiles are
+    still fetched from OpenStreetMap.
+    """
+    key = (kml_content_hash(kml_content), vendored)
+    placemarks = parse_kml_placemarks(kml_content)
+    map_html = _map_html_cache.get(key)
+    if map_html is not None:
+        return placemarks, map_html
+
+    # Initialize Map - Default to UK view
+    m = folium.Map(location=[54.5, -3.0], zoom_start=6, tiles="OpenStreetMap")
+    if vendored:
+        m.default_js = vendored_assets(m.default_js)
+        m.default_css = vendored_assets(m.default_css)
+
+    for placemark in placemarks:
+        folium.Marker(
+            location=[placemark.lat, placemark.lon],
+            popup=folium.Popup(f"<b>{placemark.name}</b><br>{placemark.description}", max_width=300),
+            tooltip=placemark.name,
+            icon=folium.Icon(color="red", icon="info-sign")
+        ).add_to(m)
+
+    if placemarks:
+        # Fit bounds to show all markers
+        m.fit_bounds([[p.lat, p.lon] for p in placemarks])
+
+    map_html = m.get_root().render()
+    _map_html_cache.put(key, map_html)
+    return placemarks, map_html
@@ -0,0 +1,227 @@
+import json
+import math
+import os
+import re
+import logging
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from analysis_store import content_hash, load_analysis
+from game_state import GameStateManager
+from transcript_store import DATA_DIR, classification_mask
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ENTITIES_FILE = os.path.join(BASE_DIR, "data", "knowledge_graph_entities.json")
+GRAPH_FILE = os.path.join(BASE_DIR, "knowledge_graph.json")
+ANALYSIS_FILE = os.path.join(BASE_DIR, "intelligence_analysis.json")
+GRAPH_FORMAT = "knowledge-graph/v1"
+
+# Co-occurrence edges seen in fewer passages than this are left out of the rendered graph,
+# and at most MAX_COOCCURRENCE_EDGES of the strongest are kept so the layout stays readable.
+MIN_EDGE_WEIGHT = 3
+MAX_COOCCURRENCE_EDGES = 150
+XML_TAG_PATTERN = re.compile(r'<[^>]+>')
+
+# Layout of knowledge_graph.json (generated, stored next to intelligence_analysis.json):
+# {"format": ..., "entities_hash": hash of the entity list, "episodes": {"N": {
+#     "source_hash": hash of the entity list, episode N's transcript text and report bodies,
+#     "mentions":    {entity id: passages in episode N mentioning it},
+#     "edges":       [[entity id, entity id, passages in episode N mentioning both], ...]}}}
+# Each episode holds only its own delta; the graph "as of episode N" is the sum of deltas 1..N.
+# An episode is recounted only when its source hash changes, so adding an episode processes just it.
+
+
+def load_entities(path=ENTITIES_FILE):
+    """The entity gazetteer: {"entities": [{id, label, type, team, color, title, aliases}], "relations": [...]}."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def entity_pattern(aliases):
+    """
+    Whole-word regex for an entity's aliases. All-caps aliases (acronyms such as "PM" or "MOD")
+    are matched case-sensitively, everything else case-insensitively.
+    """
+    acronyms = [re.escape(a) for a in aliases if a.isupper()]
+    words = [re.escape(a) for a in aliases if not a.isupper()]
+    parts = ([f"(?i:{'|'.join(words)})"] if words else []) + acronyms
+    return r'\b(?:' + '|'.join(parts) + r')\b'
+
+
+def episode_passages(manager, analysis, episode):
+    """
+    The passages co-occurrence is counted over for one episode: each non-advertisement
+    transcript segment, and each paragraph of the episode's reports and briefings.
+    """
+    table = manager.get_episode_table(episode)
+    passages = []
+    if table is not None:
+        segments = table.filter(classification_mask(table, exclude_types=['advertisement']))
+        passages.extend(text for text in segments.column('text').to_pylist() if text)
+
+    for key, body in sorted(analysis.get(f"episode_{episode}", {}).items()):
+        if not isinstance(body, str) or not key.startswith(("report_", "briefing_")):
+            continue
+        if key == "report_Geospatial":
+            body = XML_TAG_PATTERN.sub('\n\n', body)
+        passages.extend(p.strip() for p in re.split(r'\n\s*\n', body) if p.strip())
+    return passages
+
+
+def count_episode(entities, passages):
+    """
+    Counts entity mentions and co-occurrences over an episode's passages.
+
+    Each entity's pattern is evaluated over all passages in one vectorised regex kernel
+    (passages x entities regex work), keeping only the indices of the passages it matches.
+    The (passage, entity) incidence pairs are collected sparsely and pairs of entities are
+    generated from them alone (a self-join within each passage) and tallied with np.unique,
+    so the counting work is proportional to the mentions found, not to entities squared.
+    """
+    ids = [entity["id"] for entity in entities]
+    if not passages or not entities:
+        return {"mentions": {}, "edges": []}
+
+    texts = pa.array(passages, type=pa.string())
+    matches = [
+        pc.indices_nonzero(pc.match_substring_regex(texts, entity_pattern(entity["aliases"]))).to_numpy()
+        for entity in entities
+    ]
+    mentions = [len(passage_ids) for passage_ids in matches]
+
+    # Incidence pairs sorted by passage, entity ids ascending within each.
+    passage_ids = np.concatenate(matches)
+    entity_ids = np.repeat(np.arange(len(ids)), mentions)
+    order = np.lexsort((entity_ids, passage_ids))
+    passage_ids, entity_ids = passage_ids[order], entity_ids[order]
+    ends = np.searchsorted(passage_ids, passage_ids, side='right')
+    partners = ends - np.arange(len(passage_ids)) - 1
+    left = np.repeat(np.arange(len(passage_ids)), partners)
+    within = np.arange(len(left)) - np.repeat(np.cumsum(partners) - partners, partners)
+    right = left + 1 + within
+    keys, counts = np.unique(entity_ids[left] * len(ids) + entity_ids[right], return_counts=True)
+
+    return {
+        "mentions": {ids[i]: int(n) for i, n in enumerate(mentions) if n},
+        "edges": [[ids[key // len(ids)], ids[key % len(ids)], int(n)] for key, n in zip(keys, counts)],
+    }
+
+
+def load_graph(path=GRAPH_FILE):
+    """Reads the per-episode graph deltas, or an empty document if missing or unreadable."""
+    empty = {"format": GRAPH_FORMAT, "entities_hash": None, "episodes": {}}
+    if not os.path.exists(path):
+        return empty
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            document = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Ignoring unreadable knowledge graph file {path}: {e}")
+        return empty
+    if document.get("format") != GRAPH_FORMAT:
+        logger.warning(f"Ignoring knowledge graph file {path} with unsupported format {document.get('format')}")
+        return empty
+    return document
+
+
+def save_graph(document, path=GRAPH_FILE):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def update_graph(manager=None, analysis_file=ANALYSIS_FILE, entities_file=ENTITIES_FILE, path=GRAPH_FILE):
+    """
+    Brings the per-episode deltas up to date, recounting only episodes whose transcript,
+    reports or entity list changed. Returns the document.
+    """
+    manager = manager or GameStateManager(DATA_DIR)
+    gazetteer = load_entities(entities_file)
+    entities = gazetteer["entities"]
+    entities_hash = content_hash(json.dumps(entities, sort_keys=True))
+    analysis = load_analysis(analysis_file) if os.path.exists(analysis_file) else {}
+
+    document = load_graph(path)
+    stored = document["episodes"]
+    updated = {}
+    recounted = 0
+    for episode in manager.episodes:
+        passages = episode_passages(manager, analysis, episode)
+        source_hash = content_hash(entities_hash + "\n".join(passages))
+        entry = stored.get(str(episode))
+        if entry is None or entry.get("source_hash") != source_hash:
+            entry = {"source_hash": source_hash, **count_episode(entities, passages)}
+            recounted += 1
+        updated[str(episode)] = entry
+
+    document = {"format": GRAPH_FORMAT, "entities_hash": entities_hash, "episodes": updated}
+    save_graph(document, path)
+    logger.info(f"Knowledge graph up to date ({recounted} of {len(updated)} episodes recounted) in {path}")
+    return document
+
+
+def assemble_graph(document, gazetteer, episode, min_edge_weight=MIN_EDGE_WEIGHT, max_edges=MAX_COOCCURRENCE_EDGES):
+    """
+    The graph as of an episode, as vis-network {"nodes", "edges"} lists: deltas 1..episode
+    are summed, entities appear once mentioned, co-occurrence edges are weighted by the
+    number of shared passages, and curated relations are drawn once both ends have appeared.
+    """
+    mentions = {}
+    weights = {}
+    for number, delta in document["episodes"].items():
+        if int(number) > episode:
+            continue
+        for entity_id, count in delta["mentions"].items():
+            mentions[entity_id] = mentions.get(entity_id, 0) + count
+        for source, target, count in delta["edges"]:
+            weights[(source, target)] = weights.get((source, target), 0) + count
+
+    nodes = [
+        {
+            "id": entity["id"],
+            "label": entity["label"],
+            "title": f"{entity['title']}<br>Mentions to episode {episode}: {mentions[entity['id']]}",
+            "color": entity["color"],
+            "value": mentions[entity["id"]],
+        }
+        for entity in gazetteer["entities"] if entity["id"] in mentions
+    ]
+
+    edges = [
+        {
+            "id": f"{relation['from']}>{relation['to']}:{relation['label']}",
+            "from": relation["from"],
+            "to": relation["to"],
+            "label": relation["label"],
+            "title": relation["label"],
+            "color": relation["color"],
+            "width": 4,
+            "arrows": "to",
+        }
+        for relation in gazetteer["relations"]
+        if relation["from"] in mentions and relation["to"] in mentions
+    ]
+    edges.extend(
+        {
+            "id": f"{source}~{target}",
+            "from": source,
+            "to": target,
+            "title": f"Mentioned together in {weight} passages",
+            "color": {"color": "#888888", "opacity": 0.5},
+            "width": 1 + math.log2(weight),
+            "dashes": True,
+        }
+        for (source, target), weight in sorted(weights.items(), key=lambda item: -item[1])[:max_edges]
+        if weight >= min_edge_weight
+    )
+    return {"nodes": nodes, "edges": edges}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    update_graph()
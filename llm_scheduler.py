@@ -0,0 +1,283 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000
+DEFAULT_MAX_CONCURRENCY = 32
+DEFAULT_INITIAL_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 6
+BASE_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+# On a 429 the bucket rates are cut multiplicatively (never below MIN_RATE_FRACTION of the
+# configured quota); each success then adds RATE_INCREASE_FRACTION of it back, up to the quota.
+RATE_DECREASE_FACTOR = 0.5
+RATE_INCREASE_FRACTION = 0.02
+MIN_RATE_FRACTION = 1 / 16
+
+
+class RateLimitError(Exception):
+    """The model endpoint rejected a call for quota reasons (HTTP 429)."""
+
+    def __init__(self, message="rate limited", retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TransientModelError(Exception):
+    """A retryable failure (HTTP 5xx, timeout, dropped connection)."""
+
+
+class TokenBucket:
+    """Classic token bucket: holds up to `capacity` tokens, refilled continuously at `rate` per second."""
+
+    def __init__(self, capacity, rate):
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now=None):
+        """Seconds until `amount` tokens are available (0 if they are available now)."""
+        self._refill(time.monotonic() if now is None else now)
+        amount = min(amount, self.capacity)  # An oversized request waits for a full bucket
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+    def set_rate(self, rate, now=None):
+        """Changes the refill rate, scaling capacity with it so the bucket keeps the same window."""
+        self._refill(time.monotonic() if now is None else now)
+        self.capacity *= rate / self.rate
+        self.rate = float(rate)
+        self.tokens = min(self.tokens, self.capacity)
+
+
+class _Job:
+    __slots__ = ("fn", "args", "kwargs", "priority", "tokens", "future", "attempt", "submitted")
+
+    def __init__(self, fn, args, kwargs, priority, tokens):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.tokens = tokens
+        self.future = Future()
+        self.attempt = 0
+        self.submitted = time.monotonic()
+
+
+class LLMScheduler:
+    """
+    Runs model calls under request-per-minute and token-per-minute token buckets, with
+    adaptive concurrency and retries.
+
+    - Priorities: higher `priority` jobs are dispatched first; ties run in submission order.
+    - Concurrency is AIMD: +1 after a full window of successes, halved on a 429 (at most
+      once per cooldown) or when latency exceeds `latency_target`.
+    - The bucket rates are AIMD too, so a configured quota above the real one converges to
+      what the endpoint accepts: halved on a 429 (at most once per cooldown, pausing dispatch
+      for its Retry-After), then raised by a small fraction of the quota per success.
+    - 429s and transient errors are retried with full-jitter exponential backoff, honouring
+      Retry-After when the endpoint sends it.
+
+    submit() returns a concurrent.futures.Future, so callers can use as_completed,
+    asyncio.wrap_future, etc.
+    """
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY, initial_concurrency=DEFAULT_INITIAL_CONCURRENCY,
+                 max_retries=DEFAULT_MAX_RETRIES, latency_target=None):
+        # Buckets hold one minute of quota, matching how per-minute limits are enforced upstream.
+        self.request_bucket = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.token_bucket = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+        self._configured_rates = {
+            self.request_bucket: self.request_bucket.rate, self.token_bucket: self.token_bucket.rate,
+        }
+        self._last_rate_decrease = 0.0
+        self.max_concurrency = max_concurrency
+        self.concurrency = min(initial_concurrency, max_concurrency)
+        self.max_retries = max_retries
+        self.latency_target = latency_target
+
+        self._queue = []  # heap of (-priority, ready_at, seq, job)
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._successes_since_increase = 0
+        self._last_decrease = 0.0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "retries": 0, "rate_limited": 0}
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="llm-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    # --- PUBLIC API ---
+
+    def submit(self, fn, *args, priority=0, estimated_tokens=0, **kwargs):
+        """Queues fn(*args, **kwargs) and returns a Future for its result."""
+        job = _Job(fn, args, kwargs, priority, estimated_tokens)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("scheduler is shut down")
+            self._push(job, time.monotonic())
+            self.stats["submitted"] += 1
+            self._cond.notify_all()
+        return job.future
+
+    def shutdown(self, wait=True):
+        """Stops accepting work; with wait=True, returns once every queued job has finished."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if wait:
+            self._dispatcher.join()
+            self._executor.shutdown(wait=True)
+
+    def snapshot(self):
+        with self._cond:
+            return dict(self.stats, concurrency=self.concurrency, in_flight=self._in_flight, queued=len(self._queue),
+                        requests_per_minute=round(self.request_bucket.rate * 60, 1))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown(wait=True)
+
+    # --- DISPATCH ---
+
+    def _push(self, job, ready_at):
+        heapq.heappush(self._queue, (-job.priority, ready_at, next(self._seq), job))
+
+    def _next_ready(self, now):
+        """Pops the highest-priority job whose backoff has elapsed, or returns (None, wait)."""
+        deferred = []
+        job, wait = None, None
+        while self._queue:
+            entry = heapq.heappop(self._queue)
+            if entry[1] <= now:
+                job = entry[3]
+                break
+            deferred.append(entry)
+            wait = entry[1] - now if wait is None else min(wait, entry[1] - now)
+        for entry in deferred:
+            heapq.heappush(self._queue, entry)
+        return job, wait
+
+    def _dispatch_loop(self):
+        with self._cond:
+            while True:
+                if self._closed and not self._queue and self._in_flight == 0:
+                    return
+                if not self._queue or self._in_flight >= self.concurrency:
+                    self._cond.wait(timeout=1.0)
+                    continue
+
+                now = time.monotonic()
+                job, backoff_wait = self._next_ready(now)
+                if job is None:
+                    self._cond.wait(timeout=backoff_wait)
+                    continue
+
+                quota_wait = max(self.request_bucket.wait_time(1, now), self.token_bucket.wait_time(job.tokens, now))
+                if quota_wait > 0:
+                    self._push(job, now)  # Keep its place; re-evaluated after the wait
+                    self._cond.wait(timeout=quota_wait)
+                    continue
+
+                self.request_bucket.take(1)
+                self.token_bucket.take(job.tokens)
+                self._in_flight += 1
+                self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        started = time.monotonic()
+        try:
+            result = job.fn(*job.args, **job.kwargs)
+        except Exception as e:
+            self._on_error(job, e)
+        else:
+            self._on_success(job, time.monotonic() - started)
+            job.future.set_result(result)
+
+    def _on_success(self, job, latency):
+        with self._cond:
+            self._in_flight -= 1
+            self.stats["completed"] += 1
+            self._increase_rates()
+            if self.latency_target is not None and latency > self.latency_target:
+                self._decrease(f"latency {latency:.1f}s over target")
+            else:
+                # Additive increase: one extra slot per window of `concurrency` successes.
+                self._successes_since_increase += 1
+                if self._successes_since_increase >= self.concurrency and self.concurrency < self.max_concurrency:
+                    self.concurrency += 1
+                    self._successes_since_increase = 0
+            self._cond.notify_all()
+
+    def _on_error(self, job, error):
+        rate_limited = isinstance(error, RateLimitError)
+        retryable = rate_limited or isinstance(error, (TransientModelError, TimeoutError, ConnectionError))
+        with self._cond:
+            self._in_flight -= 1
+            if rate_limited:
+                self.stats["rate_limited"] += 1
+                self._decrease("rate limited")
+                self._decrease_rates(error.retry_after)
+            if retryable and job.attempt < self.max_retries:
+                job.attempt += 1
+                self.stats["retries"] += 1
+                # Full jitter spreads retries out so they do not arrive as a synchronised burst.
+                delay = random.uniform(0, min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** job.attempt))
+                if rate_limited and error.retry_after:
+                    delay = max(delay, float(error.retry_after))
+                self._push(job, time.monotonic() + delay)
+                self._cond.notify_all()
+                return
+            self.stats["failed"] += 1
+            self._cond.notify_all()
+        job.future.set_exception(error)
+
+    def _decrease(self, reason):
+        """Multiplicative decrease, applied at most once per cooldown so one burst of 429s halves once."""
+        now = time.monotonic()
+        if now - self._last_decrease < BASE_BACKOFF_SECONDS:
+            return
+        self._last_decrease = now
+        self._successes_since_increase = 0
+        previous = self.concurrency
+        self.concurrency = max(1, self.concurrency // 2)
+        if self.concurrency != previous:
+            logger.info(f"Concurrency {previous} -> {self.concurrency} ({reason})")
+
+    def _decrease_rates(self, retry_after=None):
+        """Multiplicative decrease of the bucket rates, at most once per cooldown."""
+        now = time.monotonic()
+        if now - self._last_rate_decrease < BASE_BACKOFF_SECONDS:
+            return
+        self._last_rate_decrease = now
+        for bucket, configured in self._configured_rates.items():
+            bucket.set_rate(max(configured * MIN_RATE_FRACTION, bucket.rate * RATE_DECREASE_FACTOR), now)
+            # Nothing more is admitted until the endpoint's window has had time to recover.
+            bucket.tokens = min(bucket.tokens, 0.0)
+        if retry_after:
+            self.request_bucket.tokens = min(self.request_bucket.tokens, -float(retry_after) * self.request_bucket.rate)
+        logger.info(f"Request rate -> {self.request_bucket.rate * 60:.1f}/min (rate limited)")
+
+    def _increase_rates(self):
+        """Additive increase of the bucket rates back towards the configured quota."""
+        for bucket, configured in self._configured_rates.items():
+            if bucket.rate < configured:
+                bucket.set_rate(min(configured, bucket.rate + configured * RATE_INCREASE_FRACTION))
@@ -1,94 +1,405 @@
+import argparse
+import asyncio
 import json
 import os
+import threading
 import time
 import logging
-import concurrent.futures
+from collections import namedtuple
+
 from agents import (
-    generate_situation_report, 
+    generate_situation_report,
     generate_advisor_briefing,
+    update_situation_report,
+    using_mock_model,
+    is_mock_output,
     SITUATION_PROMPTS,
-    ADVISOR_DEFINITIONS
+    ADVISOR_DEFINITIONS,
+    REPORT_KEYS,
+    BRIEFING_KEYS,
+    MODEL_ID,
+    MODEL_MAX_OUTPUT_TOKENS,
 )
+from analysis_store import content_hash, load_analysis, save_analysis
+from episode_summaries import update_summaries
+from game_state import GameStateManager
+from llm_scheduler import LLMScheduler
 
 # --- LOGGING SETUP ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-OUTPUT_FILE = "intelligence_analysis.json"
-
-def load_transcripts():
-    logger.info("Reading transcript files...")
-    files_to_load = [
-        "the_wargame_s2e1_transcript_cleaned.json",
-        "the_wargame_s2e2_transcript_cleaned.json",
-        "the_wargame_s2e3_transcript_cleaned.json"
-    ]
-    combined_text = ""
-    for filename in files_to_load:
-        path = filename if os.path.exists(filename) else os.path.join("data", filename)
-        if os.path.exists(path):
-            try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    if isinstance(data, list):
-                        for entry in data:
-                            if 'text' in entry: combined_text += f"{entry.get('speaker', 'Unknown')}: {entry['text']}\n"
-                            elif 'content' in entry: combined_text += f"{entry['content']}\n"
-                    elif isinstance(data, dict):
-                        combined_text += str(data)
-                    combined_text += "\n--- END OF EPISODE ---\n"
-            except Exception as e:
-                logger.error(f"Failed to load {path}: {e}")
-    return combined_text
-
-def main():
-    # 1. Get Context
-    context = load_transcripts()
-    if not context:
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_FILE = os.path.join(BASE_DIR, "intelligence_analysis.json")
+# Records, per (episode, key), the hash of the inputs the stored output was generated from
+# and its provenance (full generation, or a delta update of the previous episode's report).
+MANIFEST_FILE = os.path.join(BASE_DIR, "precompute_manifest.json")
+MANIFEST_FORMAT = "precompute-manifest/v1"
+# In delta mode, reports are regenerated from the full context every this many episodes
+# (episodes 1, 1+N, 1+2N, ...) to bound the drift that accumulates across updates.
+DEFAULT_FULL_REFRESH_EVERY = 3
+# Finished tasks are journaled immediately; the full analysis and manifest are rewritten
+# after this many tasks or seconds, whichever comes first, and at the end of the run.
+DEFAULT_FLUSH_EVERY = 16
+DEFAULT_FLUSH_INTERVAL = 30.0
+
+# One node of the task graph: an artifact (report or briefing) for one episode.
+Task = namedtuple("Task", ["episode", "kind", "name", "key"])
+# A planned run of a task. mode is "full" (context = summary + episode text) or "delta"
+# (context = this episode's text only, applied to the previous episode's report).
+Job = namedtuple("Job", ["task", "input_hash", "mode", "context"])
+
+
+def build_tasks(episodes):
+    """The task graph: every (episode x report/briefing) pair."""
+    tasks = []
+    for episode in episodes:
+        for report_name in SITUATION_PROMPTS:
+            tasks.append(Task(episode, "report", report_name, REPORT_KEYS.get(report_name, f"report_{report_name}")))
+        for advisor_id, definition in ADVISOR_DEFINITIONS.items():
+            tasks.append(Task(episode, "briefing", advisor_id, BRIEFING_KEYS.get(advisor_id, f"briefing_{definition['title']}")))
+    return tasks
+
+
+def task_prompt(task):
+    if task.kind == "report":
+        return SITUATION_PROMPTS[task.name]['system_prompt']
+    return ADVISOR_DEFINITIONS[task.name]['system_prompt']
+
+
+def task_input_hash(task, context, base_hash=None):
+    """
+    Hash of everything a task's output depends on: its context, prompt and model, plus for
+    delta jobs the input hash of the previous episode's report it updates. Chaining the base
+    hash means a change to an earlier episode re-flows through every later delta.
+    """
+    parts = [task.kind, task.name, task_prompt(task), MODEL_ID, content_hash(context)]
+    if base_hash is not None:
+        parts += ["delta", base_hash]
+    return content_hash(json.dumps(parts))
+
+
+def estimate_task_tokens(task, context, previous_report=""):
+    """Prompt plus output tokens a task is charged against the tokens-per-minute budget."""
+    return (len(context) + len(previous_report) + len(task_prompt(task))) // 4 + MODEL_MAX_OUTPUT_TOKENS
+
+
+def run_task(task, context, previous_report=None):
+    if task.kind == "report":
+        if previous_report is not None:
+            return update_situation_report(task.name, previous_report, context)
+        return generate_situation_report(task.name, context)
+    return generate_advisor_briefing(task.name, context)
+
+
+def is_full_refresh(episode, refresh_every):
+    return refresh_every <= 1 or (episode - 1) % refresh_every == 0
+
+
+def plan_jobs(episodes, manager, checkpoint, delta=False, refresh_every=DEFAULT_FULL_REFRESH_EVERY):
+    """
+    Plans every (episode x artifact) job with its input hash. In delta mode, reports for
+    non-refresh episodes are planned as updates of the previous episode's report, provided
+    that report is part of this run or already stored.
+    """
+    jobs = {}
+    for task in sorted(build_tasks(episodes), key=lambda t: t.episode):
+        base_key = (task.episode - 1, task.key)
+        base_hash = None
+        if delta and task.kind == "report" and not is_full_refresh(task.episode, refresh_every):
+            if base_key in jobs:
+                base_hash = jobs[base_key].input_hash
+            elif checkpoint.has_output(*base_key):
+                base_hash = checkpoint.input_hash(*base_key)
+
+        if base_hash is not None:
+            context = manager.get_episode_text(task.episode)
+            jobs[(task.episode, task.key)] = Job(task, task_input_hash(task, context, base_hash), "delta", context)
+        else:
+            context = manager.get_agent_context(task.episode)
+            jobs[(task.episode, task.key)] = Job(task, task_input_hash(task, context), "full", context)
+    return list(jobs.values())
+
+
+def load_manifest(path=MANIFEST_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        document = json.load(f)
+    if document.get("format") != MANIFEST_FORMAT:
+        logger.warning(f"Ignoring manifest {path} with unsupported format {document.get('format')}")
+        return {}
+    return document.get("tasks", {})
+
+
+class Checkpoint:
+    """
+    Holds the analysis and manifest being built. Each completed task is appended to a
+    journal next to the analysis file straight away, so an interrupted run loses at most
+    the tasks still in flight and a re-run replays the journal and picks up where it
+    stopped. The analysis and manifest themselves are rewritten (each atomically) only
+    every flush_every tasks or flush_interval seconds, and once at the end of the run.
+    """
+
+    def __init__(self, output_file=OUTPUT_FILE, manifest_file=MANIFEST_FILE,
+                 flush_every=DEFAULT_FLUSH_EVERY, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.output_file = output_file
+        self.manifest_file = manifest_file
+        self.journal_file = output_file + ".journal"
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.analysis = load_analysis(output_file) if os.path.exists(output_file) else {}
+        self.manifest = load_manifest(manifest_file)
+        self._lock = threading.Lock()
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+        self._replay_journal()
+
+    def input_hash(self, episode, key):
+        entry = self.manifest.get(f"episode_{episode}", {}).get(key)
+        return entry.get("input_hash") if isinstance(entry, dict) else entry
+
+    def has_output(self, episode, key):
+        return key in self.analysis.get(f"episode_{episode}", {})
+
+    def output(self, episode, key):
+        return self.analysis.get(f"episode_{episode}", {}).get(key)
+
+    def is_current(self, job):
+        task = job.task
+        return self.input_hash(task.episode, task.key) == job.input_hash and self.has_output(task.episode, task.key)
+
+    def _apply(self, episode_key, key, output, provenance):
+        self.analysis.setdefault(episode_key, {})[key] = output
+        self.manifest.setdefault(episode_key, {})[key] = provenance
+
+    def _replay_journal(self):
+        """Applies tasks recorded by an interrupted run after its last flush."""
+        if not os.path.exists(self.journal_file):
+            return
+        replayed = 0
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A line cut short by the interruption; that task is simply redone.
+                    continue
+                self._apply(entry["episode_key"], entry["key"], entry["output"], entry["provenance"])
+                replayed += 1
+        if replayed:
+            logger.info(f"Recovered {replayed} task(s) from {self.journal_file}")
+            self.flush()
+
+    def record(self, job, output):
+        task = job.task
+        episode_key = f"episode_{task.episode}"
+        provenance = {
+            "input_hash": job.input_hash,
+            "mode": job.mode,
+            "base": f"episode_{task.episode - 1}" if job.mode == "delta" else None,
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        line = json.dumps({"episode_key": episode_key, "key": task.key, "output": output, "provenance": provenance})
+        with self._lock:
+            with open(self.journal_file, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+            self._apply(episode_key, task.key, output, provenance)
+            self._unflushed += 1
+            due = (self._unflushed >= self.flush_every
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def adopt(self, job):
+        """Marks an existing output (generated before manifests existed) as current."""
+        with self._lock:
+            self.manifest.setdefault(f"episode_{job.task.episode}", {})[job.task.key] = {
+                "input_hash": job.input_hash, "mode": "adopted", "base": None, "generated_at": None,
+            }
+
+    def _write_manifest(self):
+        tmp_path = self.manifest_file + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"format": MANIFEST_FORMAT, "tasks": self.manifest}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_file)
+
+    def flush(self):
+        """Writes the analysis (if tasks were recorded since the last flush) and the manifest, then clears the journal."""
+        with self._lock:
+            if self._unflushed or os.path.exists(self.journal_file):
+                save_analysis(self.output_file, self.analysis)
+            self._write_manifest()
+            if os.path.exists(self.journal_file):
+                os.remove(self.journal_file)
+            self._unflushed = 0
+            self._last_flush = time.monotonic()
+
+
+class Progress:
+    """Counts finished jobs and reports progress, throughput and an ETA."""
+
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.started = time.monotonic()
+
+    def finish(self, ok):
+        self.done += 1
+        if not ok:
+            self.failed += 1
+
+    def summary(self):
+        elapsed = time.monotonic() - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.done) / rate if rate > 0 else float("inf")
+        return (f"[{self.done}/{self.total}] {self.failed} failed, "
+                f"{rate * 60:.1f} jobs/min, elapsed {elapsed:.1f}s, ETA {eta:.0f}s")
+
+
+async def run_job(job, scheduler, checkpoint, progress, done):
+    """
+    Runs one (episode, artifact) job through the scheduler and checkpoints its output.
+    A delta job first waits for the previous episode's report if that is still being generated.
+    `done` maps (episode, key) of pending jobs to futures resolved with their success.
+    """
+    task = job.task
+    label = f"episode_{task.episode}/{task.key} ({job.mode})"
+    ok = False
+    try:
+        previous_report = None
+        if job.mode == "delta":
+            base = done.get((task.episode - 1, task.key))
+            if base is not None and not await asyncio.shield(base):
+                raise RuntimeError(f"base report episode_{task.episode - 1}/{task.key} failed")
+            previous_report = checkpoint.output(task.episode - 1, task.key)
+            if previous_report is None:
+                raise RuntimeError(f"base report episode_{task.episode - 1}/{task.key} missing")
+
+        future = scheduler.submit(
+            run_task, task, job.context, previous_report,
+            priority=1 if task.kind == "report" else 0,
+            estimated_tokens=estimate_task_tokens(task, job.context, previous_report or ""),
+        )
+        output = await asyncio.wrap_future(future)
+        # Stream the result to disk as soon as it arrives (off the event loop).
+        await asyncio.to_thread(checkpoint.record, job, output)
+        ok = True
+        progress.finish(ok=True)
+        logger.info(f"✅ {progress.summary()} {label}")
+    except Exception as e:
+        # Not recorded, so the next run retries it.
+        progress.finish(ok=False)
+        logger.error(f"❌ {progress.summary()} {label} - {e}")
+    finally:
+        done[(task.episode, task.key)].set_result(ok)
+
+
+async def report_progress(progress, scheduler, interval):
+    while True:
+        await asyncio.sleep(interval)
+        logger.info(f"Progress {progress.summary()} | scheduler {scheduler.snapshot()}")
+
+
+async def run_pipeline(pending, checkpoint, scheduler, progress_interval=10.0):
+    """
+    Launches every pending (episode, artifact) job at once; the scheduler's shared rate
+    and concurrency limits decide how many are actually in flight. Returns the Progress.
+    """
+    progress = Progress(len(pending))
+    loop = asyncio.get_running_loop()
+    done = {(job.task.episode, job.task.key): loop.create_future() for job in pending}
+    reporter = asyncio.create_task(report_progress(progress, scheduler, progress_interval))
+    try:
+        await asyncio.gather(*(run_job(job, scheduler, checkpoint, progress, done) for job in pending))
+    finally:
+        reporter.cancel()
+    return progress
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the per-episode reports and briefings, skipping unchanged ones.")
+    parser.add_argument("--episodes", type=int, nargs="*", help="Episodes to generate (default: all discovered)")
+    parser.add_argument("--force", action="store_true",
+                        help="Regenerate even if inputs are unchanged, and let mock mode overwrite model-generated outputs")
+    parser.add_argument("--adopt-existing", action="store_true",
+                        help="Record outputs already in the analysis file as current instead of regenerating them "
+                             "(done automatically when there is no manifest yet)")
+    parser.add_argument("--delta", action="store_true",
+                        help="Generate reports as updates of the previous episode's report from only the new transcript")
+    parser.add_argument("--full-refresh-every", type=int, default=DEFAULT_FULL_REFRESH_EVERY,
+                        help="In --delta mode, regenerate reports from full context every N episodes")
+    parser.add_argument("--rpm", type=int, default=60, help="Model requests per minute quota")
+    parser.add_argument("--tpm", type=int, default=1_000_000, help="Model tokens per minute quota")
+    parser.add_argument("--max-concurrency", type=int, default=32,
+                        help="Upper bound for the adaptive number of calls in flight")
+    args = parser.parse_args(argv)
+
+    # 1. Get Context (rolling summary of earlier episodes + full text of the episode itself)
+    manager = GameStateManager(os.path.join(BASE_DIR, "data"))
+    if not manager.episodes:
         logger.error("No transcripts found. Exiting.")
         return
+    update_summaries(manager)
+    episodes = args.episodes or manager.episodes
 
-    results = {}
-    tasks = []
+    # 2. Plan the task graph and skip jobs whose inputs are unchanged
+    checkpoint = Checkpoint()
+    # Without a manifest there is no record of what the stored outputs were generated from;
+    # adopt them rather than regenerating (and, in mock mode, overwriting) every one.
+    adopt_existing = args.adopt_existing or (not args.force and not os.path.exists(checkpoint.manifest_file))
+    if adopt_existing and not args.adopt_existing:
+        logger.info(f"No manifest at {checkpoint.manifest_file}; adopting the outputs already in {checkpoint.output_file}.")
+    mock = using_mock_model()
+    jobs = plan_jobs(episodes, manager, checkpoint, delta=args.delta, refresh_every=args.full_refresh_every)
+    pending = []
+    kept = 0
+    for job in jobs:
+        existing = checkpoint.output(job.task.episode, job.task.key)
+        if adopt_existing and existing is not None:
+            checkpoint.adopt(job)
+        elif args.force or not checkpoint.is_current(job):
+            if mock and not args.force and existing is not None and not is_mock_output(existing):
+                # Never replace model-generated output with a placeholder unless forced.
+                kept += 1
+                continue
+            pending.append(job)
+    if adopt_existing:
+        checkpoint.flush()
+    if kept:
+        logger.warning(
+            f"Mock mode: keeping {kept} stale model-generated output(s) instead of overwriting them with "
+            f"placeholders. Set WARGAME_MODEL_ENDPOINT to regenerate them, or pass --force to overwrite."
+        )
+
+    delta_jobs = sum(job.mode == "delta" for job in pending)
+    logger.info(
+        f"{len(jobs) - len(pending) - kept} of {len(jobs)} tasks up to date; generating {len(pending)} "
+        f"({delta_jobs} as delta updates), ~{sum(len(job.context) for job in pending) // 4:,} context tokens."
+    )
+
+    # 3. Fan out every job concurrently under the quota-aware scheduler, checkpointing each
+    # result as it completes. Concurrency starts at the job count (capped) and adapts to the
+    # endpoint (AIMD on 429s), so a full run takes about as long as its slowest job when the
+    # quota allows it. Situation reports are dispatched before briefings.
+    if not pending:
+        logger.info("Nothing to do.")
+        return
+    with LLMScheduler(requests_per_minute=args.rpm, tokens_per_minute=args.tpm,
+                      max_concurrency=args.max_concurrency,
+                      initial_concurrency=min(len(pending), args.max_concurrency)) as scheduler:
+        try:
+            progress = asyncio.run(run_pipeline(pending, checkpoint, scheduler))
+        finally:
+            checkpoint.flush()
+        logger.info(f"Scheduler: {scheduler.snapshot()}")
+
+    if progress.failed:
+        logger.warning(f"{progress.failed} task(s) failed; re-run to retry them.")
+    else:
+        logger.info(f"🎉 SUCCESS. {progress.summary()}. Analysis saved to {checkpoint.output_file}")
 
-    # 2. Queue Tasks
-    logger.info(f"Queueing tasks for {len(SITUATION_PROMPTS)} Reports and {len(ADVISOR_DEFINITIONS)} Advisors...")
-    
-    for report_name in SITUATION_PROMPTS:
-        tasks.append(("report", report_name))
-    for advisor_name in ADVISOR_DEFINITIONS:
-        tasks.append(("advisor", advisor_name))
-
-    # 3. Execute in Parallel
-    # We can use higher workers here as we run this offline/once, 
-    # but keeping it safe at 4 to avoid hitting strict quotas.
-    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-        future_to_task = {}
-        
-        for t_type, t_name in tasks:
-            if t_type == "report":
-                future = executor.submit(generate_situation_report, t_name, context)
-            else:
-                future = executor.submit(generate_advisor_briefing, t_name, context)
-            future_to_task[future] = (t_type, t_name)
-
-        for future in concurrent.futures.as_completed(future_to_task):
-            t_type, t_name = future_to_task[future]
-            key = f"report_{t_name}" if t_type == "report" else f"briefing_{t_name}"
-            
-            try:
-                content = future.result()
-                results[key] = content
-                logger.info(f"✅ Generated: {key}")
-            except Exception as e:
-                logger.error(f"❌ Failed: {key} - {e}")
-                results[key] = f"Generation Failed: {e}"
-
-    # 4. Save to Disk
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(results, f, indent=2)
-    
-    logger.info(f"🎉 SUCCESS. Analysis saved to {OUTPUT_FILE}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
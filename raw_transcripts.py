@@ -0,0 +1,179 @@
+import argparse
+import glob
+import json
+import os
+import re
+import time
+import logging
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from transcript_store import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+RAW_TRANSCRIPT_GLOB = "the_wargame_s*e*_transcript.txt"
+# Diarized lines look like "[0.03–7.54] SPEAKER_15: text" (en dash, occasionally a hyphen).
+RAW_LINE_PATTERN = (
+    r'^\[(?P<segment>(?P<start>\d+(?:\.\d+)?)\s*[–-]\s*(?P<end>\d+(?:\.\d+)?))\]\s*'
+    r'(?P<speaker>[^:]+?):\s?(?P<text>.*?)\s*$'
+)
+
+
+def discover_raw_transcript_files(data_dir=DATA_DIR):
+    """Returns the raw diarized transcript files in (season, episode) order."""
+    return sorted(glob.glob(os.path.join(data_dir, RAW_TRANSCRIPT_GLOB)), key=episode_label_from_path)
+
+
+def episode_label_from_path(path):
+    """(season, episode) encoded in a raw transcript filename, e.g. ..._s2e3_transcript.txt -> (2, 3)."""
+    match = re.search(r's(\d+)e(\d+)_transcript\.txt$', os.path.basename(path))
+    return (int(match.group(1)), int(match.group(2))) if match else (0, 0)
+
+
+class RawTranscript:
+    """
+    One diarized episode as columns: start/end seconds (float64), speaker ids (dictionary
+    encoded) and the turn texts as an Arrow string array, i.e. offsets into one buffer.
+
+    Time lookups bisect the start column and a running maximum of the end column, so
+    "what was said between t0 and t1" is two searchsorted calls; turns are also grouped
+    by speaker once so "every turn by SPEAKER_n" is a slice.
+    """
+
+    def __init__(self, episode, table):
+        self.episode = episode
+        # Turns are normally in time order already; sort (stably) in case they are not.
+        if table.num_rows and not np.all(np.diff(table.column("start").to_numpy()) >= 0):
+            table = table.take(pc.sort_indices(table, sort_keys=[("start", "ascending")]))
+        self.table = table
+        self.start = table.column("start").to_numpy()
+        self.end = table.column("end").to_numpy()
+        # Running max of end times is non-decreasing even if turns overlap, so it can be bisected.
+        self._max_end = np.maximum.accumulate(self.end) if len(self.end) else self.end
+
+        speaker = table.column("speaker").combine_chunks()
+        self.speakers = speaker.dictionary.to_pylist()
+        codes = speaker.indices.to_numpy()
+        self._by_speaker = np.argsort(codes, kind="stable")
+        self._speaker_offsets = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(self.speakers)))])
+        self._speaker_codes = {name: code for code, name in enumerate(self.speakers)}
+
+    def __len__(self):
+        return self.table.num_rows
+
+    @property
+    def texts(self):
+        return self.table.column("text")
+
+    def between(self, t0, t1):
+        """Row indices of turns overlapping [t0, t1) seconds, in time order."""
+        lo = int(np.searchsorted(self._max_end, t0, side="right"))
+        hi = int(np.searchsorted(self.start, t1, side="left"))
+        if hi <= lo:
+            return np.empty(0, dtype=np.int64)
+        rows = np.arange(lo, hi)
+        return rows[self.end[lo:hi] > t0]
+
+    def by_speaker(self, speaker_id):
+        """Row indices of every turn by a speaker id (e.g. "SPEAKER_11"), in time order."""
+        code = self._speaker_codes.get(speaker_id)
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        return self._by_speaker[self._speaker_offsets[code]:self._speaker_offsets[code + 1]]
+
+    def turns(self, rows):
+        """The given rows as a table (start, end, speaker, text, ...)."""
+        return self.table.take(pa.array(rows, type=pa.int64()))
+
+    def to_cleaning_records(self):
+        """
+        Turns as clean-transcript records with the speaker identity and classification left
+        empty, i.e. the input to the cleaning step (data/transcript_cleaning_prompt.txt).
+        """
+        return [
+            {
+                "episode": self.episode,
+                "segment": segment,
+                "original_speaker_id": speaker,
+                "identified_speaker": None,
+                "identified_role": None,
+                "classification": None,
+                "text": text,
+            }
+            for segment, speaker, text in zip(
+                self.table.column("segment").to_pylist(),
+                self.table.column("speaker").to_pylist(),
+                self.texts.to_pylist(),
+            )
+        ]
+
+
+def parse_raw_transcript(path):
+    """
+    Parses one raw diarized transcript in a single vectorised pass: the file is split into
+    lines and every line is matched at once with a regex kernel. Non-matching lines are
+    dropped with a warning.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    season, episode = episode_label_from_path(path)
+
+    lines = pc.split_pattern(pa.array([content]), "\n").flatten()
+    lines = lines.filter(pc.invert(pc.match_substring_regex(lines, r'^\s*$')))
+    parts = pc.extract_regex(lines, RAW_LINE_PATTERN)
+    valid = pc.is_valid(parts)
+    skipped = len(lines) - pc.sum(valid).as_py() if len(lines) else 0
+    if skipped:
+        logger.warning(f"Skipped {skipped} unparseable lines in {os.path.basename(path)}")
+    parts = parts.filter(valid)
+
+    table = pa.table({
+        "start": pc.struct_field(parts, "start").cast(pa.float64()),
+        "end": pc.struct_field(parts, "end").cast(pa.float64()),
+        "speaker": pc.struct_field(parts, "speaker").dictionary_encode(),
+        "text": pc.struct_field(parts, "text"),
+        "segment": pc.struct_field(parts, "segment"),
+    })
+    return RawTranscript(f"S{season}E{episode}", table)
+
+
+def load_raw_transcripts(data_dir=DATA_DIR):
+    """Parses every raw transcript in data_dir. Returns {episode label: RawTranscript}."""
+    return {
+        transcript.episode: transcript
+        for transcript in map(parse_raw_transcript, discover_raw_transcript_files(data_dir))
+    }
+
+
+def write_cleaning_input(transcript, output_path):
+    """Writes an episode's turns as JSON Lines records ready for the cleaning step."""
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for record in transcript.to_cleaning_records():
+            f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n")
+    os.replace(tmp_path, output_path)
+    logger.info(f"Wrote {len(transcript)} turns to {output_path}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Parse raw diarized transcripts into columns.")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--cleaning-input", metavar="DIR",
+                        help="Write each episode's turns as <DIR>/<episode>_turns.jsonl for the cleaning step")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    transcripts = load_raw_transcripts(args.data_dir)
+    elapsed = time.perf_counter() - started
+    total = sum(len(t) for t in transcripts.values())
+    logger.info(f"Parsed {total} turns from {len(transcripts)} episodes in {elapsed * 1000:.1f} ms")
+    for label, transcript in transcripts.items():
+        logger.info(f"{label}: {len(transcript)} turns, {len(transcript.speakers)} speakers, "
+                    f"{transcript.end.max() if len(transcript) else 0:.0f}s")
+        if args.cleaning_input:
+            os.makedirs(args.cleaning_input, exist_ok=True)
+            write_cleaning_input(transcript, os.path.join(args.cleaning_input, f"{label.lower()}_turns.jsonl"))
@@ -0,0 +1,119 @@
+import re
+import logging
+
+from analysis_store import content_hash
+from bounded_cache import BoundedCache
+
+logger = logging.getLogger(__name__)
+
+MAX_CACHED_REPORTS = 256
+
+RED = "#cc3333"
+GREEN = "#28a745"
+
+# Explicit tags: [BOLD RED: Text], [**BOLD RED: Text**], [**BOLD RED: Text] etc.
+TAG_PATTERN = re.compile(r"\[(?:\*\*)?BOLD (RED|GREEN): (.*?)(?:\*\*)?\]")
+# Fallback: **Text**, coloured when it contains a status keyword.
+BOLD_MARKER = "**"
+# Substring keywords, matched against the lower-cased bold text. RED wins over GREEN.
+RED_KEYWORDS = re.compile(r"damaged|destroyed|sunk|crippled|fire|casualt")
+GREEN_KEYWORDS = re.compile(r"operational|transit|active|deployed")
+
+_html_cache = BoundedCache(MAX_CACHED_REPORTS)
+
+
+def _span_open(color_code):
+    return f'<span style="color: {color_code}; font-weight: bold;">'
+
+
+RED_SPAN_OPEN = _span_open(RED)
+GREEN_SPAN_OPEN = _span_open(GREEN)
+SPAN_CLOSE = "</span>"
+
+
+def _span(color_code, content):
+    return f"{_span_open(color_code)}{content}{SPAN_CLOSE}"
+
+
+def _bold(content):
+    lower_content = content.lower()
+    if RED_KEYWORDS.search(lower_content):
+        return _span(RED, content)
+    if GREEN_KEYWORDS.search(lower_content):
+        return _span(GREEN, content)
+    return f"{BOLD_MARKER}{content}{BOLD_MARKER}"  # No change
+
+
+def _split_markers(text, pieces):
+    """Appends text to pieces with None in place of each "**" (paired left to right, without overlap)."""
+    parts = text.split(BOLD_MARKER)
+    split = [None] * (2 * len(parts) - 1)
+    split[::2] = parts
+    pieces.extend(split)
+
+
+def format_llm_output(text):
+    """
+    Formats raw LLM output by replacing custom tags with HTML styles.
+    Target tags: [**BOLD RED: ...**] and [**BOLD GREEN: ...**]
+    Fallback: Colors **Text** red/green based on keywords.
+
+    Single pass: the text is cut at tags and "**" markers, converting tags as they are
+    found, then consecutive markers are paired into bold spans. A tag may sit inside a bold
+    span (and "**" inside a tag), so a span's keywords are matched against its content with
+    the inner tags already converted to HTML, exactly as converting every tag first and then
+    colouring bold spans would. A bold span never extends past a newline.
+    """
+    if not isinstance(text, str):
+        return str(text)
+    if "BOLD " not in text and BOLD_MARKER not in text:
+        return text
+
+    pieces = []
+    cursor = 0
+    for match in TAG_PATTERN.finditer(text):
+        _split_markers(text[cursor:match.start()], pieces)
+        pieces.append(RED_SPAN_OPEN if match.group(1).upper() == "RED" else GREEN_SPAN_OPEN)
+        _split_markers(match.group(2), pieces)
+        pieces.append(SPAN_CLOSE)
+        cursor = match.end()
+    _split_markers(text[cursor:], pieces)
+
+    out = []
+    bold = None  # Pieces since an unclosed "**"
+    for piece in pieces:
+        if piece is None:
+            if bold is None:
+                bold = []
+            else:
+                out.append(_bold("".join(bold)))
+                bold = None
+        elif bold is None:
+            out.append(piece)
+        elif "\n" in piece:
+            # No closing marker on this line: the opening one stays as written.
+            out.append(BOLD_MARKER)
+            out.extend(bold)
+            out.append(piece)
+            bold = None
+        else:
+            bold.append(piece)
+    if bold is not None:
+        out.append(BOLD_MARKER)
+        out.extend(bold)
+    return "".join(out)
+
+
+def format_report_html(text):
+    """
+    Returns format_llm_output(text), cached by content hash and shared by every
+    session, so a report is formatted once per process rather than on every view.
+    """
+    if not isinstance(text, str):
+        return str(text)
+    key = content_hash(text)
+    html = _html_cache.get(key)
+    if html is None:
+        html = format_llm_output(text)
+        _html_cache.put(key, html)
+    return html
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import logging
+
+from bounded_cache import BoundedCache
+from transcript_store import DATA_DIR, discover_transcript_files, source_fingerprint
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RESPONSE_CACHE_FILE = os.path.join(BASE_DIR, "response_cache.sqlite")
+SYSTEM_PROMPTS_FILE = os.path.join(BASE_DIR, "prompts", "system_prompts.json")
+
+MAX_MEMORY_ENTRIES = 256
+MAX_DISK_ENTRIES = 5000
+TTL_SECONDS = 7 * 24 * 3600
+
+
+def normalize_prompt(prompt):
+    """Case-folds, collapses whitespace and drops trailing punctuation so trivial variants share an entry."""
+    return re.sub(r'\s+', ' ', prompt).strip().casefold().rstrip('?!. ')
+
+
+def data_fingerprint(data_dir=DATA_DIR, system_prompts_file=SYSTEM_PROMPTS_FILE, model_id="mock"):
+    """
+    Fingerprint of the inputs an answer depends on (advisor prompts, transcripts and the
+    model that generates it). It is part of every key, so editing either file or switching
+    models invalidates all cached answers.
+    """
+    paths = [p for p in [system_prompts_file] if os.path.exists(p)] + discover_transcript_files(data_dir)
+    return hashlib.sha256(f"{model_id}|{source_fingerprint(paths)}".encode('utf-8')).hexdigest()[:16]
+
+
+class ResponseCache:
+    """
+    Two-tier cache of advisor answers: a process-wide in-memory LRU in front of a
+    SQLite table that survives restarts. Entries expire after ttl_seconds, and the
+    disk tier is trimmed to max_disk_entries by least-recent use.
+    """
+
+    def __init__(self, db_path=RESPONSE_CACHE_FILE, fingerprint=None, max_memory_entries=MAX_MEMORY_ENTRIES,
+                 max_disk_entries=MAX_DISK_ENTRIES, ttl_seconds=TTL_SECONDS):
+        self.db_path = db_path
+        self.fingerprint = fingerprint if fingerprint is not None else data_fingerprint()
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = BoundedCache(max_memory_entries)
+        self._lock = threading.Lock()
+        self._db = None
+        try:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, fingerprint TEXT NOT NULL, "
+                "created_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            # Drop answers computed from older prompts/transcripts, and expired ones.
+            self._db.execute(
+                "DELETE FROM responses WHERE fingerprint != ? OR created_at < ?",
+                (self.fingerprint, time.time() - ttl_seconds),
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Response cache disk tier unavailable ({db_path}): {e}. Using memory only.")
+            self._db = None
+
+    def make_key(self, advisor_id, episode, prompt, system_prompt):
+        """Key over (advisor id, episode, normalized prompt, system-prompt hash, data fingerprint)."""
+        system_prompt_hash = hashlib.sha256(system_prompt.encode('utf-8')).hexdigest()
+        parts = [advisor_id, int(episode), normalize_prompt(prompt), system_prompt_hash, self.fingerprint]
+        return hashlib.sha256(json.dumps(parts).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Returns the cached answer or None, checking memory first and then disk."""
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None and now - entry[1] < self.ttl_seconds:
+            with self._lock:
+                self.memory_hits += 1
+            return entry[0]
+
+        with self._lock:
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT response, created_at FROM responses WHERE key = ? AND created_at >= ?",
+                    (key, now - self.ttl_seconds),
+                ).fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    self.disk_hits += 1
+                    self._memory.put(key, (row[0], row[1]))
+                    return row[0]
+            self.misses += 1
+        return None
+
+    def put(self, key, response):
+        now = time.time()
+        self._memory.put(key, (response, now))
+        with self._lock:
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, fingerprint, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, response, self.fingerprint, now, now),
+                )
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,),
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to persist cached response: {e}")
+
+    def stats(self):
+        with self._lock:
+            disk_entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] if self._db else 0
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+            }
@@ -0,0 +1,177 @@
+import math
+import re
+import logging
+from collections import Counter, defaultdict, namedtuple
+
+import numpy as np
+import pyarrow as pa
+
+from transcript_store import classification_mask, to_records
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters (standard Okapi defaults)
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+DEFAULT_TOP_K = 8
+DEFAULT_NEIGHBOURS = 1
+DEFAULT_TOKEN_BUDGET = 2000
+CHARS_PER_TOKEN = 4  # Rough estimate used to keep retrieved context under the budget
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+STOPWORDS = frozenset("""
+a an and are as at be but by do does for from has have he her his i if in is it its
+me my no not of on or our she so that the their them then there they this to was we
+were what when where which who will with would you your
+""".split())
+
+Retrieval = namedtuple("Retrieval", ["rows", "segment_ids", "scores", "tokens"])
+
+
+def tokenize(text):
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def estimate_tokens(text):
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+def segment_ids(episodes):
+    """Stable ids for citations: episode plus the row's position within that episode (e.g. "S2E3-0123")."""
+    ids = []
+    position = Counter()
+    for episode in episodes:
+        ids.append(f"{episode}-{position[episode]:04d}")
+        position[episode] += 1
+    return ids
+
+
+class TranscriptRetriever:
+    """
+    BM25 index over the clean transcript segments, built once and shared by every session.
+    Postings are numpy arrays, so scoring a query is a handful of vectorised updates.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        texts = table.column("text").to_pylist()
+        episodes = table.column("episode").to_pylist()
+        self.episode_numbers = table.column("episode_number").to_numpy()
+
+        self.segment_ids = segment_ids(episodes)
+
+        postings = defaultdict(lambda: ([], []))
+        self.doc_lengths = np.zeros(len(texts), dtype=np.float64)
+        self.token_estimates = np.zeros(len(texts), dtype=np.int64)
+        for row, text in enumerate(texts):
+            text = text or ""
+            terms = Counter(tokenize(text))
+            self.doc_lengths[row] = sum(terms.values())
+            self.token_estimates[row] = estimate_tokens(text)
+            for term, tf in terms.items():
+                postings[term][0].append(row)
+                postings[term][1].append(tf)
+
+        self.num_docs = len(texts)
+        self.avg_doc_length = float(self.doc_lengths.mean()) if self.num_docs else 0.0
+        self._norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths / (self.avg_doc_length or 1.0))
+        self.postings = {
+            term: (np.array(rows, dtype=np.int64), np.array(tfs, dtype=np.float64))
+            for term, (rows, tfs) in postings.items()
+        }
+        logger.info(f"Retrieval index built: {self.num_docs} segments, {len(self.postings)} terms.")
+
+    def scores(self, query):
+        """BM25 score of every segment for the query."""
+        scores = np.zeros(self.num_docs, dtype=np.float64)
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            rows, tfs = self.postings[term]
+            idf = math.log(1 + (self.num_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * tfs * (BM25_K1 + 1) / (tfs + self._norm[rows])
+        return scores
+
+    def filter_mask(self, max_episode=None, episodes=None, include_types=None, exclude_types=("advertisement",)):
+        """Boolean numpy mask of segments allowed by the episode and classification filters."""
+        mask = classification_mask(self.table, include_types, exclude_types).to_numpy(zero_copy_only=False)
+        if max_episode is not None:
+            mask &= self.episode_numbers <= max_episode
+        if episodes is not None:
+            mask &= np.isin(self.episode_numbers, list(episodes))
+        return mask
+
+    def retrieve(self, query, top_k=DEFAULT_TOP_K, neighbours=DEFAULT_NEIGHBOURS,
+                 token_budget=DEFAULT_TOKEN_BUDGET, **filters):
+        """
+        Returns the top_k matching segments plus up to `neighbours` rows either side of each
+        (within the same episode and filters), keeping the total under token_budget.
+        Hits are admitted best-first; the result is in transcript order.
+
+        A query with no lexical match (only stopwords, or a paraphrase) falls back to the most
+        recent allowed segments, so the advisor is never asked without transcript context.
+        """
+        mask = self.filter_mask(**filters)
+        scores = np.where(mask, self.scores(query), 0.0)
+        candidates = np.flatnonzero(scores > 0)
+        if not len(candidates):
+            return self.recent(mask, token_budget)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        hits = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        selected = {}
+        used = 0
+        for hit in hits:
+            group = [hit] + [
+                row for offset in range(1, neighbours + 1) for row in (hit - offset, hit + offset)
+                if 0 <= row < self.num_docs and mask[row]
+                and self.episode_numbers[row] == self.episode_numbers[hit]
+            ]
+            for row in group:
+                row = int(row)
+                if row in selected:
+                    continue
+                cost = int(self.token_estimates[row])
+                if used + cost > token_budget:
+                    continue
+                selected[row] = float(scores[row])
+                used += cost
+
+        rows = sorted(selected)
+        return Retrieval(
+            rows=rows,
+            segment_ids=[self.segment_ids[row] for row in rows],
+            scores=[selected[row] for row in rows],
+            tokens=used,
+        )
+
+    def recent(self, mask, token_budget=DEFAULT_TOKEN_BUDGET):
+        """The latest segments allowed by mask, in the last allowed episode, up to token_budget."""
+        allowed = np.flatnonzero(mask)
+        rows = []
+        used = 0
+        if len(allowed):
+            latest_episode = self.episode_numbers[allowed[-1]]
+            for row in allowed[::-1]:
+                cost = int(self.token_estimates[row])
+                if self.episode_numbers[row] != latest_episode or used + cost > token_budget:
+                    break
+                rows.append(int(row))
+                used += cost
+        rows.reverse()
+        return Retrieval(
+            rows=rows,
+            segment_ids=[self.segment_ids[row] for row in rows],
+            scores=[0.0] * len(rows),
+            tokens=used,
+        )
+
+    def records(self, retrieval):
+        """Clean-transcript style dicts for a retrieval, each tagged with its segment_id for citation."""
+        rows = self.table.take(pa.array(retrieval.rows, type=pa.int64()))
+        return [
+            {"segment_id": segment_id, **record}
+            for segment_id, record in zip(retrieval.segment_ids, to_records(rows))
+        ]
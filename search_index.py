@@ -0,0 +1,236 @@
+import html
+import math
+import re
+import time
+import logging
+from collections import namedtuple
+
+import numpy as np
+
+from retrieval import TOKEN_PATTERN, BM25_K1, BM25_B, segment_ids
+
+logger = logging.getLogger(__name__)
+
+REPORT_PREFIX = "report_"
+BRIEFING_PREFIX = "briefing_"
+GEOSPATIAL_KEY = "report_Geospatial"
+XML_TAG_PATTERN = re.compile(r'<[^>]+>')
+QUERY_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+# Same tokens as TOKEN_PATTERN on lower-cased text, but matched on the original so spans line up.
+TOKEN_SPAN_PATTERN = re.compile(TOKEN_PATTERN.pattern, re.IGNORECASE)
+
+FACET_FIELDS = ("source", "episode", "classification", "speaker")
+DEFAULT_LIMIT = 20
+SNIPPET_CHARS = 240
+
+SearchDocument = namedtuple("SearchDocument", ["doc_id", "title", "text", "source", "episode", "classification", "speaker"])
+SearchHit = namedtuple("SearchHit", ["document", "score", "snippet"])
+SearchResults = namedtuple("SearchResults", ["hits", "total", "facets", "elapsed_ms"])
+
+
+def index_tokens(text):
+    """Lower-cased word tokens with their character spans. Stopwords are kept so phrases match exactly."""
+    return [(m.group(0).lower(), m.start(), m.end()) for m in TOKEN_SPAN_PATTERN.finditer(text)]
+
+
+def parse_query(query):
+    """Splits a query into clauses: each quoted phrase or bare word is one clause (a list of terms)."""
+    clauses = []
+    for phrase, word in QUERY_PATTERN.findall(query):
+        terms = [token for token, _, _ in index_tokens(phrase or word)]
+        if terms:
+            clauses.append(terms)
+    return clauses
+
+
+def documents_from_store(store):
+    """Search documents for every clean transcript segment and every report/briefing body."""
+    table = store.transcripts
+    columns = {name: table.column(name).to_pylist()
+               for name in ("episode", "episode_number", "classification", "identified_speaker", "text")}
+    documents = [
+        SearchDocument(doc_id, f"{episode} {speaker or 'Unknown'}", text or "", "transcript",
+                       int(number), classification or "", speaker or "")
+        for doc_id, episode, number, classification, speaker, text in zip(
+            segment_ids(columns["episode"]), columns["episode"], columns["episode_number"],
+            columns["classification"], columns["identified_speaker"], columns["text"],
+        )
+    ]
+
+    for episode_key, reports in store.analysis.items():
+        episode = int(episode_key.split("_")[-1])
+        for key in reports:
+            if key.startswith(REPORT_PREFIX):
+                source, name = "report", key[len(REPORT_PREFIX):]
+            elif key.startswith(BRIEFING_PREFIX):
+                source, name = "briefing", key[len(BRIEFING_PREFIX):].replace("_", " ")
+            else:
+                continue
+            body = reports[key]
+            if not isinstance(body, str):
+                continue
+            if key == GEOSPATIAL_KEY:
+                # Index the placemark names and descriptions, not the KML markup
+                body = re.sub(r'\s+', ' ', XML_TAG_PATTERN.sub(' ', body)).strip()
+            documents.append(SearchDocument(
+                f"{episode_key}/{key}", f"Episode {episode} {name} {source}", body, source, episode, "", ""
+            ))
+    return documents
+
+
+class SearchIndex:
+    """
+    Positional inverted index over transcripts and reports, built once and shared by every session.
+
+    Every document's tokens are laid out in one global position space (with a one-position gap
+    between documents), and each term's postings are a sorted numpy array of global positions.
+    A phrase is then matched by shifting the first term's positions and bisecting the others',
+    and the owning document of any position is one searchsorted over the document starts.
+    """
+
+    def __init__(self, documents):
+        started = time.perf_counter()
+        self.documents = documents
+        self.num_docs = len(documents)
+
+        postings = {}
+        doc_starts = np.zeros(self.num_docs, dtype=np.int64)
+        doc_lengths = np.zeros(self.num_docs, dtype=np.float64)
+        position = 0
+        for doc, document in enumerate(documents):
+            tokens = TOKEN_PATTERN.findall(document.text.lower())
+            doc_starts[doc] = position
+            doc_lengths[doc] = len(tokens)
+            for offset, token in enumerate(tokens):
+                postings.setdefault(token, []).append(position + offset)
+            position += len(tokens) + 1  # Gap so phrases never span two documents
+
+        self.doc_starts = doc_starts
+        self.doc_lengths = doc_lengths
+        self.postings = {term: np.array(positions, dtype=np.int64) for term, positions in postings.items()}
+        average_length = float(doc_lengths.mean()) if self.num_docs else 0.0
+        self._norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths / (average_length or 1.0))
+
+        self.doc_episodes = np.array([document.episode for document in documents], dtype=np.int64)
+
+        # Facets are categorical codes per document, so filters and counts are vectorised.
+        self.facet_values = {}
+        self.facet_codes = {}
+        for field in FACET_FIELDS:
+            values, codes = np.unique([getattr(d, field) for d in documents], return_inverse=True)
+            self.facet_values[field] = values.tolist()
+            self.facet_codes[field] = codes.astype(np.int32)
+
+        logger.info(
+            f"Search index built: {self.num_docs} documents, {len(self.postings)} terms, "
+            f"{position} positions in {(time.perf_counter() - started) * 1000:.0f} ms."
+        )
+
+    @classmethod
+    def from_store(cls, store):
+        return cls(documents_from_store(store))
+
+    def options(self, field):
+        """Non-empty values of a facet, for building filter widgets."""
+        return [value for value in self.facet_values[field] if value != ""]
+
+    # --- MATCHING ---
+
+    def _clause_positions(self, terms):
+        """Global start positions of every occurrence of the clause (a word or a phrase)."""
+        starts = self.postings.get(terms[0])
+        if starts is None:
+            return np.empty(0, dtype=np.int64)
+        for offset, term in enumerate(terms[1:], 1):
+            positions = self.postings.get(term)
+            if positions is None:
+                return np.empty(0, dtype=np.int64)
+            wanted = starts + offset
+            found = np.searchsorted(positions, wanted)
+            found[found == len(positions)] = 0
+            starts = starts[positions[found] == wanted]
+            if not len(starts):
+                break
+        return starts
+
+    def _filter_mask(self, filters):
+        mask = np.ones(self.num_docs, dtype=bool)
+        for field, selected in filters.items():
+            if not selected:
+                continue
+            lookup = {value: code for code, value in enumerate(self.facet_values[field])}
+            codes = [lookup[value] for value in selected if value in lookup]
+            mask &= np.isin(self.facet_codes[field], codes)
+        return mask
+
+    def search(self, query, limit=DEFAULT_LIMIT, up_to_episode=None, **filters):
+        """
+        Finds documents containing every clause of the query ("quoted phrases" and words),
+        ranked by BM25 over clause occurrences. With up_to_episode, only documents from
+        episodes 1..up_to_episode are considered. filters map facet fields (source, episode,
+        classification, speaker) to the values to keep. Facet counts cover all query
+        matches before the filters are applied.
+        """
+        started = time.perf_counter()
+        clauses = parse_query(query)
+        if not clauses:
+            return SearchResults([], 0, {field: {} for field in FACET_FIELDS}, 0.0)
+
+        matched = np.ones(self.num_docs, dtype=bool)
+        if up_to_episode is not None:
+            matched &= self.doc_episodes <= up_to_episode
+        scores = np.zeros(self.num_docs, dtype=np.float64)
+        for terms in clauses:
+            docs, counts = np.unique(
+                np.searchsorted(self.doc_starts, self._clause_positions(terms), side="right") - 1,
+                return_counts=True,
+            )
+            present = np.zeros(self.num_docs, dtype=bool)
+            present[docs] = True
+            matched &= present
+            idf = math.log(1 + (self.num_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * counts * (BM25_K1 + 1) / (counts + self._norm[docs])
+
+        facets = {}
+        for field in FACET_FIELDS:
+            counts = np.bincount(self.facet_codes[field][matched], minlength=len(self.facet_values[field]))
+            facets[field] = {
+                value: int(count) for value, count in zip(self.facet_values[field], counts) if count and value != ""
+            }
+
+        candidates = np.flatnonzero(matched & self._filter_mask(filters))
+        total = len(candidates)
+        if total > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        highlight = {term for terms in clauses for term in terms}
+        hits = [
+            SearchHit(self.documents[doc], float(scores[doc]), make_snippet(self.documents[doc].text, highlight))
+            for doc in ranked
+        ]
+        return SearchResults(hits, total, facets, (time.perf_counter() - started) * 1000)
+
+
+def make_snippet(text, terms, width=SNIPPET_CHARS):
+    """HTML snippet of about `width` characters around the first match, with query terms in <mark>."""
+    tokens = [(start, end) for token, start, end in index_tokens(text) if token in terms]
+    first = tokens[0][0] if tokens else 0
+    begin = max(0, first - width // 3)
+    if begin:
+        # Start on a word boundary
+        space = text.rfind(" ", 0, begin)
+        begin = space + 1 if space != -1 else begin
+    finish = min(len(text), begin + width)
+
+    parts = ["…" if begin else ""]
+    cursor = begin
+    for start, end in tokens:
+        if start < begin or end > finish:
+            continue
+        parts.append(html.escape(text[cursor:start]))
+        parts.append(f"<mark>{html.escape(text[start:end])}</mark>")
+        cursor = end
+    parts.append(html.escape(text[cursor:finish]))
+    parts.append("…" if finish < len(text) else "")
+    return "".join(parts)
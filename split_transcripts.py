@@ -1,53 +1,136 @@
+import argparse
 import json
 import os
 import re
 
-def split_transcripts():
-    input_file = 'data/the_wargame_s2e1+2+3_clean_transcript.json'
-    output_dir = 'data'
-    
+# Bytes read per chunk. Memory use is bounded by this plus the largest single segment,
+# independent of the size of the combined transcript.
+READ_CHUNK_SIZE = 1 << 16
+
+def iter_json_array(f, chunk_size=READ_CHUNK_SIZE):
+    """
+    Incrementally parses a top-level JSON array (or a JSON Lines stream) from a text file,
+    yielding one element at a time without loading the whole document.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+
+    while True:
+        # Skip whitespace and the array brackets/commas between elements
+        while position < len(buffer) and (buffer[position].isspace() or buffer[position] in "[,]"):
+            position += 1
+
+        if position >= len(buffer):
+            if eof:
+                return
+            buffer = f.read(chunk_size)
+            position = 0
+            eof = not buffer
+            continue
+
+        try:
+            element, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # Element spans the chunk boundary: keep the unparsed tail and read more
+            more = f.read(chunk_size)
+            eof = not more
+            buffer = buffer[position:] + more
+            position = 0
+            continue
+
+        yield element
+        position = end
+        if position > chunk_size:
+            buffer = buffer[position:]
+            position = 0
+
+
+def _discard(outputs):
+    for handle, tmp_path, _, _ in outputs.values():
+        handle.close()
+        os.remove(tmp_path)
+
+
+def split_transcripts(input_file='data/the_wargame_s2e1+2+3_clean_transcript.json', output_dir='data',
+                      output_format='jsonl'):
+    """
+    Splits a combined clean transcript into per-episode files, streaming: entries are
+    written to their episode's file as they are parsed.
+
+    output_format 'jsonl' writes clean_transcript_s2eN.jsonl (one compact segment per line);
+    'json' writes clean_transcript_s2eN.json as a JSON array with one segment per line.
+    Files are written to a temporary name and moved into place once the input is fully read.
+    """
     print(f"Reading from {input_file}...")
-    
+
+    extension = ".jsonl" if output_format == 'jsonl' else ".json"
+    outputs = {}  # episode number -> [file, tmp path, final path, count]
+
     try:
         with open(input_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+            for entry in iter_json_array(f):
+                if not isinstance(entry, dict):
+                    print("Error: Input data is not a list of segments.")
+                    _discard(outputs)
+                    return
+
+                ep = entry.get('episode')
+                if not ep:
+                    print(f"Warning: Entry missing 'episode' field: {entry}")
+                    continue
+
+                # Extract episode number from S2E1, S2E2, etc.
+                match = re.search(r'E(\d+)', ep)
+                if not match:
+                    print(f"Warning: Could not parse episode number from '{ep}'. Skipping.")
+                    continue
+                ep_num = match.group(1)
+
+                output = outputs.get(ep_num)
+                if output is None:
+                    output_path = os.path.join(output_dir, f"clean_transcript_s2e{ep_num}{extension}")
+                    tmp_path = output_path + ".tmp"
+                    output = outputs[ep_num] = [open(tmp_path, 'w', encoding='utf-8'), tmp_path, output_path, 0]
+                    if output_format == 'json':
+                        output[0].write("[\n")
+
+                line = json.dumps(entry, ensure_ascii=False, separators=(',', ':'))
+                if output_format == 'json':
+                    line = ("" if output[3] == 0 else ",\n") + line
+                else:
+                    line += "\n"
+                output[0].write(line)
+                output[3] += 1
     except FileNotFoundError:
         print(f"Error: File {input_file} not found.")
         return
-
-    if not isinstance(data, list):
-        print("Error: Input data is not a list.")
+    except json.JSONDecodeError as e:
+        print(f"Error: Could not parse {input_file}: {e}")
+        _discard(outputs)
         return
 
-    episodes = {}
-    
-    # Group by episode
-    for entry in data:
-        ep = entry.get('episode')
-        if not ep:
-            print(f"Warning: Entry missing 'episode' field: {entry}")
-            continue
-            
-        if ep not in episodes:
-            episodes[ep] = []
-        episodes[ep].append(entry)
-    
-    # Write to separate files
-    for ep, entries in episodes.items():
-        # Extract episode number from S2E1, S2E2, etc.
-        match = re.search(r'E(\d+)', ep)
-        if match:
-            ep_num = match.group(1)
-            filename = f"clean_transcript_s2e{ep_num}.json"
-            output_path = os.path.join(output_dir, filename)
-            
-            print(f"Writing {len(entries)} entries to {output_path}...")
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(entries, f, indent=2, ensure_ascii=False)
-        else:
-            print(f"Warning: Could not parse episode number from '{ep}'. Skipping.")
+    for ep_num, (handle, tmp_path, output_path, count) in sorted(outputs.items(), key=lambda item: int(item[0])):
+        if output_format == 'json':
+            handle.write("\n]\n")
+        handle.close()
+        os.replace(tmp_path, output_path)
+        # Loaders prefer .jsonl, so a stale .jsonl copy would shadow a freshly written .json
+        stale_path = os.path.splitext(output_path)[0] + ".jsonl"
+        if extension == ".json" and os.path.exists(stale_path):
+            os.remove(stale_path)
+        print(f"Wrote {count} entries to {output_path}")
 
     print("Done.")
 
 if __name__ == "__main__":
-    split_transcripts()
+    parser = argparse.ArgumentParser(description="Split a combined clean transcript into per-episode files.")
+    parser.add_argument("input_file", nargs="?", default='data/the_wargame_s2e1+2+3_clean_transcript.json')
+    parser.add_argument("--output-dir", default='data')
+    parser.add_argument("--format", choices=["jsonl", "json"], default="jsonl",
+                        help="jsonl: one compact segment per line (default); json: a JSON array")
+    args = parser.parse_args()
+    split_transcripts(args.input_file, args.output_dir, args.format)
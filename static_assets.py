@@ -0,0 +1,88 @@
+import base64
+import hashlib
+import mimetypes
+import os
+import re
+import shutil
+import logging
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Streamlit serves <app dir>/static/* at app/static/* when server.enableStaticServing is on.
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+STATIC_URL_PREFIX = "app/static"
+
+IMG_SRC_PATTERN = re.compile(r'(<img\s[^>]*src=")([^"]+)"', re.IGNORECASE)
+MERMAID_PATTERN = re.compile(r'```mermaid(.*?)```', re.DOTALL)
+
+
+def file_content_hash(path, length=12):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:length]
+
+
+def publish_static_file(path):
+    """
+    Copies a file into the static directory under a content-hashed name and returns its
+    URL. Because the name changes whenever the content does, browsers can keep the file
+    cached and revalidate it cheaply. Returns None if the file cannot be published.
+    """
+    try:
+        stem, ext = os.path.splitext(os.path.basename(path))
+        name = f"{stem}.{file_content_hash(path)}{ext}"
+        target = os.path.join(STATIC_DIR, name)
+        if not os.path.exists(target):
+            os.makedirs(STATIC_DIR, exist_ok=True)
+            tmp_path = target + ".tmp"
+            shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, target)
+        return f"{STATIC_URL_PREFIX}/{name}"
+    except OSError as e:
+        logger.warning(f"Could not publish {path} as a static file: {e}")
+        return None
+
+
+def inline_data_uri(path):
+    """Returns the file as a base64 data URI, or None if it is missing or of unknown type."""
+    mime_type, _ = mimetypes.guess_type(path)
+    if mime_type is None:
+        return None
+    try:
+        with open(path, "rb") as f:
+            img_bytes = f.read()
+    except FileNotFoundError:
+        return None
+    return f"data:{mime_type};base64,{base64.b64encode(img_bytes).decode()}"
+
+
+def prepare_markdown_page(full_path, serve_static=False):
+    """
+    Reads a markdown page and resolves its local <img> sources, either inlined as base64
+    (works anywhere, including Docker without static serving) or as static file URLs.
+    Returns (content, mermaid_code) with the Mermaid block removed from content.
+    Raises FileNotFoundError if the page itself is missing.
+    """
+    with open(full_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    page_dir = os.path.dirname(full_path)
+
+    def resolve_image(match):
+        tag_start = match.group(1)
+        img_path = os.path.join(page_dir, match.group(2))
+        if not os.path.isfile(img_path):
+            return match.group(0)
+        src = publish_static_file(img_path) if serve_static else None
+        if src is None:
+            src = inline_data_uri(img_path)
+        return f'{tag_start}{src}"' if src else match.group(0)
+
+    content = IMG_SRC_PATTERN.sub(resolve_image, content)
+
+    mermaid_code = ""
+    match = MERMAID_PATTERN.search(content)
+    if match:
+        mermaid_code = match.group(1)
+        # Remove the mermaid block from the main content string
+        content = MERMAID_PATTERN.sub("", content)
+    return content, mermaid_code
@@ -0,0 +1,128 @@
+import argparse
+import json
+import random
+import threading
+import time
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm_scheduler import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# A local stand-in for the model endpoint, so the scheduler and precompute pipeline can be
+# exercised offline. POST /v1/generate {"system_prompt", "prompt", "max_tokens"} returns
+# {"text", "usage"} after a simulated latency, or 429 (with Retry-After) once the emulated
+# per-minute request/token quota is exhausted, or 503 at the configured error rate.
+
+CHARS_PER_TOKEN = 4
+
+
+class StubModelState:
+    def __init__(self, requests_per_minute, tokens_per_minute, base_latency, seconds_per_1k_tokens, error_rate):
+        self.request_bucket = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.token_bucket = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+        self.base_latency = base_latency
+        self.seconds_per_1k_tokens = seconds_per_1k_tokens
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.counts = {"ok": 0, "rate_limited": 0, "errors": 0}
+
+    def admit(self, tokens):
+        """Returns 0 if the call fits the quota (and charges it), else seconds until it would."""
+        with self.lock:
+            wait = max(self.request_bucket.wait_time(1), self.token_bucket.wait_time(tokens))
+            if wait > 0:
+                self.counts["rate_limited"] += 1
+                return wait
+            self.request_bucket.take(1)
+            self.token_bucket.take(tokens)
+            return 0
+
+
+def make_handler(state):
+    class StubModelHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+        def _reply(self, status, payload, headers=None):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/healthz":
+                with state.lock:
+                    self._reply(200, dict(state.counts))
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/v1/generate":
+                self._reply(404, {"error": "not found"})
+                return
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            except json.JSONDecodeError:
+                self._reply(400, {"error": "invalid JSON"})
+                return
+
+            prompt_tokens = (len(request.get("system_prompt", "")) + len(request.get("prompt", ""))) // CHARS_PER_TOKEN
+            completion_tokens = int(request.get("max_tokens", 512))
+            wait = state.admit(prompt_tokens + completion_tokens)
+            if wait > 0:
+                self._reply(429, {"error": "quota exceeded"}, {"Retry-After": f"{wait:.2f}"})
+                return
+            if random.random() < state.error_rate:
+                with state.lock:
+                    state.counts["errors"] += 1
+                self._reply(503, {"error": "model overloaded"})
+                return
+
+            # Latency grows with prompt size, with some jitter.
+            latency = state.base_latency + state.seconds_per_1k_tokens * prompt_tokens / 1000
+            time.sleep(latency * random.uniform(0.8, 1.2))
+            with state.lock:
+                state.counts["ok"] += 1
+            text = f"[STUB RESPONSE] {completion_tokens} tokens for a {prompt_tokens}-token prompt."
+            self._reply(200, {
+                "text": text,
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens},
+            })
+
+    return StubModelHandler
+
+
+def serve(host="127.0.0.1", port=8089, requests_per_minute=60, tokens_per_minute=200_000,
+          base_latency=1.0, seconds_per_1k_tokens=0.05, error_rate=0.02):
+    """Starts the stub on a background thread and returns the server (call .shutdown() to stop)."""
+    state = StubModelState(requests_per_minute, tokens_per_minute, base_latency, seconds_per_1k_tokens, error_rate)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.state = state
+    threading.Thread(target=server.serve_forever, name="stub-model-server", daemon=True).start()
+    logger.info(f"Stub model server on http://{host}:{server.server_port}/v1/generate "
+                f"({requests_per_minute} RPM, {tokens_per_minute} TPM, {error_rate:.0%} errors)")
+    return server
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Local model endpoint stand-in with latency and quota emulation.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--rpm", type=int, default=60, help="Requests per minute before 429s")
+    parser.add_argument("--tpm", type=int, default=200_000, help="Tokens per minute before 429s")
+    parser.add_argument("--latency", type=float, default=1.0, help="Base seconds per call")
+    parser.add_argument("--latency-per-1k", type=float, default=0.05, help="Extra seconds per 1k prompt tokens")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Fraction of calls answered with 503")
+    args = parser.parse_args()
+    server = serve(args.host, args.port, args.rpm, args.tpm, args.latency, args.latency_per_1k, args.error_rate)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,228 @@
+import glob
+import hashlib
+import json
+import os
+import re
+import logging
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+TRANSCRIPT_STORE_FILE = "clean_transcripts.arrow"
+# Per-episode transcripts are either a JSON array (.json) or JSON Lines (.jsonl, one segment per line).
+TRANSCRIPT_GLOB = "clean_transcript_s2e*.json*"
+TRANSCRIPT_EXTENSIONS = (".json", ".jsonl")
+# Segments are written as "0.03–7.54" (en dash); unparseable segments get null times.
+SEGMENT_PATTERN = r'^\s*(?P<start>\d+(?:\.\d+)?)\s*[–-]\s*(?P<end>\d+(?:\.\d+)?)'
+
+# Fields that repeat across thousands of segments are dictionary-encoded.
+CATEGORICAL_FIELDS = ["episode", "original_speaker_id", "identified_speaker", "identified_role", "classification"]
+TEXT_FIELDS = ["segment", "text"]
+SOURCE_FINGERPRINT_KEY = b"source_fingerprint"
+
+
+def discover_transcript_files(data_dir=DATA_DIR):
+    """
+    Returns the clean transcript files in episode order, one per episode. If an episode
+    exists in both formats, the .jsonl file is used.
+    """
+    by_episode = {}
+    for path in sorted(glob.glob(os.path.join(data_dir, TRANSCRIPT_GLOB))):
+        if not path.endswith(TRANSCRIPT_EXTENSIONS):
+            continue
+        episode = episode_number_from_path(path)
+        if episode not in by_episode or path.endswith(".jsonl"):
+            by_episode[episode] = path
+    return [by_episode[episode] for episode in sorted(by_episode)]
+
+
+def episode_number_from_path(path):
+    """Episode number encoded in a transcript filename (e.g. ..._s2e3.json -> 3), or 0."""
+    match = re.search(r'e(\d+)\.jsonl?$', path)
+    return int(match.group(1)) if match else 0
+
+
+def file_fingerprint(path):
+    stat = os.stat(path)
+    return f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def source_fingerprint(paths):
+    """Cheap fingerprint (name, size, mtime) of the source files, used to detect a stale store."""
+    return "|".join(file_fingerprint(path) for path in paths)
+
+
+def iter_jsonl(path):
+    """Yields one entry per non-blank line of a JSON Lines file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.warning(f"Skipping malformed line {line_number} in {os.path.basename(path)}: {e}")
+
+
+def _read_entries(paths):
+    entries = []
+    for path in paths:
+        if path.endswith(".jsonl"):
+            try:
+                entries.extend(entry for entry in iter_jsonl(path) if isinstance(entry, dict))
+            except OSError as e:
+                logger.warning(f"Failed to read transcript file {os.path.basename(path)}: {e}")
+            continue
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"Failed to load or parse transcript file {os.path.basename(path)}: {e}")
+            continue
+        if isinstance(data, list):
+            entries.extend(data)
+        else:
+            logger.warning(f"Transcript file {os.path.basename(path)} content is not a list. Skipping.")
+    return entries
+
+
+def build_transcript_table(data_dir=DATA_DIR, paths=None):
+    """
+    Compiles the clean transcript JSON files (all of them, or just `paths`) into a single
+    columnar table. Repeated string fields are dictionary-encoded and the "start–end"
+    segment strings are pre-parsed into float64 start/end columns.
+    """
+    if paths is None:
+        paths = discover_transcript_files(data_dir)
+    entries = _read_entries(paths)
+
+    columns = {}
+    for field in CATEGORICAL_FIELDS:
+        columns[field] = pa.array([entry.get(field) for entry in entries], type=pa.string()).dictionary_encode()
+    for field in TEXT_FIELDS:
+        columns[field] = pa.array([entry.get(field) for entry in entries], type=pa.string())
+
+    episode_numbers = pc.extract_regex(columns["episode"].cast(pa.string()), r'E(?P<n>\d+)')
+    columns["episode_number"] = pc.fill_null(
+        pc.struct_field(episode_numbers, "n").cast(pa.int16()), 0
+    )
+
+    bounds = pc.extract_regex(pc.fill_null(columns["segment"], ""), SEGMENT_PATTERN)
+    columns["start"] = pc.struct_field(bounds, "start").cast(pa.float64())
+    columns["end"] = pc.struct_field(bounds, "end").cast(pa.float64())
+
+    table = pa.table(columns)
+    # Keep episodes contiguous (stable within an episode) so prefixes can be sliced.
+    order = pc.sort_indices(table, sort_keys=[("episode_number", "ascending")])
+    table = table.take(order)
+    return table.replace_schema_metadata({SOURCE_FINGERPRINT_KEY: source_fingerprint(paths).encode()})
+
+
+def build_transcript_store(data_dir=DATA_DIR, output_file=TRANSCRIPT_STORE_FILE):
+    """Writes the columnar transcript table as an Arrow IPC file that loaders can memory-map."""
+    table = build_transcript_table(data_dir)
+    output_path = os.path.join(data_dir, output_file)
+    tmp_path = output_path + ".tmp"
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, output_path)
+    logger.info(f"Wrote {table.num_rows} transcript segments to {output_path}")
+    return output_path
+
+
+def open_transcript_store(data_dir=DATA_DIR, store_file=TRANSCRIPT_STORE_FILE):
+    """
+    Memory-maps the compiled store without a freshness check. Returns (table, fingerprint parts)
+    so callers can check individual source files, or (None, frozenset()) if it does not exist.
+    """
+    store_path = os.path.join(data_dir, store_file)
+    if not os.path.exists(store_path):
+        return None, frozenset()
+    table = pa.ipc.open_file(pa.memory_map(store_path, 'r')).read_all()
+    stored = (table.schema.metadata or {}).get(SOURCE_FINGERPRINT_KEY, b"").decode()
+    return table, frozenset(stored.split("|"))
+
+
+def load_transcript_table(data_dir=DATA_DIR, store_file=TRANSCRIPT_STORE_FILE):
+    """
+    Memory-maps the compiled transcript store (zero-copy). Falls back to compiling
+    the JSON sources in memory if the store is missing or older than its sources.
+    """
+    store_path = os.path.join(data_dir, store_file)
+    if os.path.exists(store_path):
+        source = pa.memory_map(store_path, 'r')
+        table = pa.ipc.open_file(source).read_all()
+        stored = (table.schema.metadata or {}).get(SOURCE_FINGERPRINT_KEY, b"").decode()
+        if stored == source_fingerprint(discover_transcript_files(data_dir)):
+            return table
+        logger.warning(f"{store_file} is stale; rebuilding from JSON. Run `python transcript_store.py` to refresh it.")
+    else:
+        logger.warning(f"{store_file} not found; compiling transcripts in memory. Run `python transcript_store.py` to build it.")
+    return build_transcript_table(data_dir)
+
+
+# --- VECTORISED FILTERS ---
+
+def classification_mask(table, include_types=None, exclude_types=None):
+    """
+    Boolean mask over rows by classification, e.g. include_types=['blue']
+    or exclude_types=['advertisement']. Evaluated as a single vectorised is_in.
+    """
+    classification = table.column("classification")
+    mask = pa.chunked_array([pa.array(np.ones(table.num_rows, dtype=bool))])
+    if include_types is not None:
+        mask = pc.and_(mask, pc.is_in(classification, value_set=pa.array(list(include_types), type=pa.string())))
+    if exclude_types:
+        excluded = pc.is_in(classification, value_set=pa.array(list(exclude_types), type=pa.string()))
+        mask = pc.and_(mask, pc.invert(excluded))
+    return mask
+
+
+def word_counts(table):
+    """Number of whitespace-separated words in each row's text."""
+    return pc.count_substring_regex(pc.fill_null(table.column("text"), ""), r'\S+')
+
+
+def episode_end_offsets(table):
+    """Maps episode number -> end row offset, assuming rows are episode-ordered."""
+    numbers = table.column("episode_number").to_numpy()
+    offsets = {0: 0}
+    for ep in np.unique(numbers):
+        offsets[int(ep)] = int(np.searchsorted(numbers, ep, side='right'))
+    return offsets
+
+
+def to_records(table, columns=("episode", "segment", "original_speaker_id", "identified_speaker",
+                               "identified_role", "classification", "text")):
+    """Converts (a slice of) the table back to clean-transcript style dicts."""
+    return table.select(list(columns)).to_pylist()
+
+
+def viewer_corpus(table):
+    """
+    Returns (content_hash, payload) for the browser transcript viewer. The payload is
+    columnar: repeated role/classification strings are sent once and referenced by
+    index, and the viewer filters by episode number client-side.
+    """
+    roles = table.column('identified_role').combine_chunks()
+    classifications = table.column('classification').combine_chunks()
+    payload = {
+        "text": table.column('text').to_pylist(),
+        "roles": roles.dictionary.to_pylist(),
+        "role": roles.indices.to_pylist(),
+        "classifications": classifications.dictionary.to_pylist(),
+        "classification": classifications.indices.to_pylist(),
+        "episode": table.column('episode_number').to_pylist(),
+    }
+    encoded = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest(), payload
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    build_transcript_store()
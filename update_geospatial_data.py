@@ -2,6 +2,8 @@ import json
 import os
 import sys
 
+from analysis_store import load_analysis, save_analysis
+
 def update_geospatial_data():
     # Define file paths
     base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -21,8 +23,7 @@ def update_geospatial_data():
 
     # 2. Read JSON content
     try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = load_analysis(json_path)
     except FileNotFoundError:
         print(f"Error: JSON file not found at {json_path}")
         sys.exit(1)
@@ -39,10 +40,9 @@ def update_geospatial_data():
             updated_count += 1
             print(f"Updated {episode_key}")
 
-    # 4. Save updated JSON
+    # 4. Save updated JSON (the KML body is stored once and referenced by every episode)
     try:
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
+        save_analysis(json_path, data)
         print(f"Successfully updated {updated_count} episodes in {json_path}")
     except Exception as e:
         print(f"Error saving JSON file: {e}")
@@ -50,8 +50,7 @@ def update_geospatial_data():
 
     # 5. Verification
     print("\n--- Verification ---")
-    with open(json_path, 'r', encoding='utf-8') as f:
-        verified_data = json.load(f)
+    verified_data = load_analysis(json_path)
     
     first_episode = list(verified_data.keys())[0]
     geospatial_data = verified_data[first_episode].get('report_Geospatial', '')
@@ -0,0 +1,199 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import urllib.parse
+import urllib.request
+import logging
+
+from static_assets import STATIC_DIR, STATIC_URL_PREFIX
+
+logger = logging.getLogger(__name__)
+
+# Front-end libraries the pages load, pinned to exact versions. Each package is a base URL
+# plus the entry files the app references; url(...) references inside CSS files (fonts,
+# marker images) are followed and vendored alongside, keeping their relative layout.
+# The map libraries are not listed here: they are whatever the installed folium references
+# (see folium_packages), so the vendored copies always match the maps folium renders.
+VENDOR_PACKAGES = {
+    "mermaid": ("https://cdn.jsdelivr.net/npm/mermaid@10.9.1/dist/", ["mermaid.min.js"]),
+    "vis-network": ("https://unpkg.com/vis-network@9.1.9/standalone/umd/", ["vis-network.min.js"]),
+}
+MERMAID_JS_URL = "https://cdn.jsdelivr.net/npm/mermaid@10.9.1/dist/mermaid.min.js"
+VIS_NETWORK_JS_URL = "https://unpkg.com/vis-network@9.1.9/standalone/umd/vis-network.min.js"
+
+VENDOR_DIR = os.path.join(STATIC_DIR, "vendor")
+VENDOR_MANIFEST_FILE = os.path.join(VENDOR_DIR, "manifest.json")
+VENDOR_URL_PREFIX = f"{STATIC_URL_PREFIX}/vendor"
+CSS_URL_PATTERN = re.compile(r'url\(\s*[\'"]?([^\'")]+)[\'"]?\s*\)')
+DOWNLOAD_TIMEOUT_SECONDS = 60
+
+# Layout of static/vendor/ (generated at image build time, see Dockerfile):
+#   <package>.<content hash>/<path relative to the package base URL>
+#   manifest.json: {"packages": {package: {"base": url, "dir": dirname, "files": [...]}}, "urls": {CDN url: vendored path}}
+# The directory name changes whenever any file in the package does, so every URL is
+# content-addressed and can be cached indefinitely by the browser.
+
+_manifest_cache = {"mtime": None, "urls": {}}
+
+
+def load_vendor_manifest(path=VENDOR_MANIFEST_FILE):
+    if not os.path.exists(path):
+        return {"packages": {}, "urls": {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def vendored_url(cdn_url, manifest_file=VENDOR_MANIFEST_FILE):
+    """
+    The app-static URL of a vendored copy of a CDN asset, or cdn_url unchanged if it has
+    not been vendored. The manifest is re-read only when it changes.
+    """
+    try:
+        mtime = os.stat(manifest_file).st_mtime_ns
+    except OSError:
+        return cdn_url
+    if mtime != _manifest_cache["mtime"]:
+        try:
+            urls = load_vendor_manifest(manifest_file)["urls"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable vendor manifest {manifest_file}: {e}")
+            urls = {}
+        _manifest_cache.update(mtime=mtime, urls=urls)
+    path = _manifest_cache["urls"].get(cdn_url)
+    return f"{VENDOR_URL_PREFIX}/{path}" if path else cdn_url
+
+
+def vendored_assets(assets):
+    """
+    Rewrites a list of (name, url) pairs (e.g. folium default_js/default_css) to vendored
+    URLs. All or nothing: if any of them has not been vendored (e.g. folium was upgraded
+    since), the list is returned unchanged rather than mixing local and CDN copies.
+    """
+    rewritten = [(name, vendored_url(url)) for name, url in assets]
+    missing = [url for (_, url), (_, local) in zip(assets, rewritten) if local == url]
+    if missing:
+        logger.warning(f"Not vendored, using CDN assets: {', '.join(missing)}. Run `python vendor_assets.py`.")
+        return list(assets)
+    return rewritten
+
+
+def package_base(url):
+    """
+    Base URL a single CDN file is vendored relative to: the directory above the file's own,
+    so stylesheet references such as ../fonts/ or images/ stay inside the package.
+    """
+    parts = urllib.parse.urlsplit(url)
+    directories = parts.path.split('/')[1:-1]
+    kept = directories[:-1] if len(directories) > 1 else directories
+    return f"{parts.scheme}://{parts.netloc}/" + "".join(f"{directory}/" for directory in kept)
+
+
+def folium_packages():
+    """One package per script/stylesheet the installed folium's maps reference, named after folium's own key."""
+    import folium
+
+    packages = {}
+    for name, url in folium.Map.default_js + folium.Map.default_css:
+        base = package_base(url)
+        packages[f"folium-{name}"] = (base, [url[len(base):]])
+    return packages
+
+
+def _fetch(url, mirror=None):
+    if mirror:
+        parsed = urllib.parse.urlsplit(url)
+        url = f"{mirror.rstrip('/')}/{parsed.netloc}{parsed.path}"
+    with urllib.request.urlopen(url, timeout=DOWNLOAD_TIMEOUT_SECONDS) as response:
+        return response.read()
+
+
+def download_package(base_url, entries, mirror=None):
+    """
+    Downloads a package's entry files plus everything their CSS references under base_url.
+    Returns {relative path: bytes}.
+    """
+    files = {}
+    pending = list(entries)
+    while pending:
+        relative = pending.pop()
+        if relative in files:
+            continue
+        url = urllib.parse.urljoin(base_url, relative)
+        files[relative] = _fetch(url, mirror)
+        if not relative.endswith(".css"):
+            continue
+        for reference in CSS_URL_PATTERN.findall(files[relative].decode('utf-8', errors='replace')):
+            if reference.startswith(("data:", "#")):
+                continue
+            target = urllib.parse.urljoin(url, reference.split('?')[0].split('#')[0])
+            if not target.startswith(base_url):
+                logger.warning(f"Not vendoring {target}: outside {base_url}")
+                continue
+            pending.append(target[len(base_url):])
+    return files
+
+
+def vendor_packages(packages=VENDOR_PACKAGES, vendor_dir=VENDOR_DIR, mirror=None, force=False):
+    """
+    Downloads every package into vendor_dir under a content-hashed directory and writes the
+    manifest mapping each CDN URL to its vendored path. Packages already vendored from the
+    same base URL are kept unless force is set.
+    """
+    os.makedirs(vendor_dir, exist_ok=True)
+    manifest_file = os.path.join(vendor_dir, "manifest.json")
+    manifest = load_vendor_manifest(manifest_file)
+    updated = {"packages": {}, "urls": {}}
+
+    for name, (base_url, entries) in packages.items():
+        existing = manifest["packages"].get(name)
+        if (not force and existing and existing["base"] == base_url
+                and os.path.isdir(os.path.join(vendor_dir, existing["dir"]))):
+            updated["packages"][name] = existing
+            logger.info(f"{name}: already vendored in {existing['dir']}")
+        else:
+            files = download_package(base_url, entries, mirror)
+            digest = hashlib.sha256()
+            for relative in sorted(files):
+                digest.update(relative.encode('utf-8') + b"\0" + files[relative])
+            directory = f"{name}.{digest.hexdigest()[:12]}"
+            target = os.path.join(vendor_dir, directory)
+            if not os.path.isdir(target):
+                tmp_dir = tempfile.mkdtemp(prefix=f".{name}-", dir=vendor_dir)
+                for relative, content in files.items():
+                    path = os.path.join(tmp_dir, *relative.split('/'))
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with open(path, 'wb') as f:
+                        f.write(content)
+                os.replace(tmp_dir, target)
+            if existing and existing["dir"] != directory:
+                shutil.rmtree(os.path.join(vendor_dir, existing["dir"]), ignore_errors=True)
+            updated["packages"][name] = {"base": base_url, "dir": directory, "files": sorted(files)}
+            logger.info(f"{name}: vendored {len(files)} files into {directory}")
+
+        package = updated["packages"][name]
+        for relative in package.get("files", entries):
+            updated["urls"][base_url + relative] = f"{package['dir']}/{relative}"
+
+    tmp_path = manifest_file + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(updated, f, indent=2)
+    os.replace(tmp_path, manifest_file)
+
+    # Packages no longer referenced (e.g. after a folium upgrade) are removed.
+    for name, existing in manifest["packages"].items():
+        if name not in updated["packages"]:
+            shutil.rmtree(os.path.join(vendor_dir, existing["dir"]), ignore_errors=True)
+    return updated
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Download pinned front-end libraries into static/vendor.")
+    parser.add_argument("--mirror", help="Fetch from <mirror>/<cdn host>/<path> instead of the CDNs")
+    parser.add_argument("--force", action="store_true", help="Re-download packages that are already vendored")
+    args = parser.parse_args()
+    vendor_packages({**VENDOR_PACKAGES, **folium_packages()}, mirror=args.mirror, force=args.force)
@@ -1,25 +1,41 @@
+import os
+import random
 import re
+import time
 
-def format_llm_output(text):
+from analysis_store import load_analysis
+from report_formatting import format_llm_output, format_report_html
+
+def reference_format_llm_output(text):
     """
-    Formats raw LLM output by replacing custom tags with HTML styles.
-    Target tags: [**BOLD RED: ...**] and [**BOLD GREEN: ...**]
+    The original two-pass formatter (tags, then keyword-coloured bold spans), kept
+    verbatim as the reference the single-pass report_formatting module must match byte for byte.
     """
     if not isinstance(text, str):
         return str(text)
 
-    def replace_match(match):
+    def replace_tag_match(match):
         color_name = match.group(1).upper()
         content = match.group(2)
-        # Define colors: Red for bad/damaged, Green for good/operational
         color_code = "#cc3333" if color_name == "RED" else "#28a745"
         return f'<span style="color: {color_code}; font-weight: bold;">{content}</span>'
 
-    # Regex to capture COLOR and Content. Handles optional ** markers.
-    # Matches: [BOLD RED: Text], [**BOLD RED: Text**], [**BOLD RED: Text] etc.
-    pattern = r"\[(?:\*\*)?BOLD (RED|GREEN): (.*?)(?:\*\*)?\]"
-    
-    return re.sub(pattern, replace_match, text)
+    pattern_tags = r"\[(?:\*\*)?BOLD (RED|GREEN): (.*?)(?:\*\*)?\]"
+    text = re.sub(pattern_tags, replace_tag_match, text)
+
+    def replace_keyword_match(match):
+        content = match.group(1)
+        lower_content = content.lower()
+        if any(w in lower_content for w in ['damaged', 'destroyed', 'sunk', 'crippled', 'fire', 'casualt']):
+            color_code = "#cc3333"
+        elif any(w in lower_content for w in ['operational', 'transit', 'active', 'deployed']):
+            color_code = "#28a745"
+        else:
+            return match.group(0)
+        return f'<span style="color: {color_code}; font-weight: bold;">{content}</span>'
+
+    pattern_keywords = r"\*\*(.*?)\*\*"
+    return re.sub(pattern_keywords, replace_keyword_match, text)
 
 def test_formatting():
     test_cases = [
@@ -38,17 +54,88 @@ def test_formatting():
         (
             "No tags here",
             "No tags here"
-        )
+        ),
+        (
+            "Carrier: **Deployed** / Escort: **Sunk** / Tanker: **Unknown**",
+            'Carrier: <span style="color: #28a745; font-weight: bold;">Deployed</span> / Escort: '
+            '<span style="color: #cc3333; font-weight: bold;">Sunk</span> / Tanker: **Unknown**'
+        ),
+        (
+            "**Status [BOLD GREEN: Active] after fire**",
+            '<span style="color: #cc3333; font-weight: bold;">Status <span style="color: #28a745; font-weight: bold;">Active</span> after fire</span>'
+        ),
+    ]
+
+    # Edge cases of the single-pass scanner, compared against the reference
+    test_cases += [
+        (text, reference_format_llm_output(text)) for text in [
+            "**Sunk\n** and **Active**",
+            "***Damaged*** / ****",
+            "[BOLD RED: a **b] c fire**",
+            "**x [**BOLD GREEN: y**] operational** [BOLD RED: unclosed",
+            "[BOLD RED: one][BOLD GREEN: two]**active**",
+            "**Deployed",
+        ]
     ]
 
+    failures = 0
     for input_text, expected in test_cases:
         result = format_llm_output(input_text)
         if result == expected:
             print(f"PASS: {input_text}")
         else:
+            failures += 1
             print(f"FAIL: {input_text}")
             print(f"  Expected: {expected}")
             print(f"  Got:      {result}")
+    return failures
+
+def test_regression(texts):
+    """Every stored report must format byte-identically to the reference implementation."""
+    failures = 0
+    for text in texts:
+        if format_llm_output(text) != reference_format_llm_output(text):
+            failures += 1
+            print(f"FAIL: output differs for report starting {text[:60]!r}")
+    print(f"{'PASS' if not failures else 'FAIL'}: {len(texts) - failures}/{len(texts)} stored reports byte-identical")
+    return failures
+
+def test_random(count=20000, seed=0):
+    """Random mixes of tags, markers, newlines and keywords must format like the reference."""
+    fragments = ["**", "*", "\n", " ", "x", "[", "]", "**]", "[BOLD RED: ", "[**BOLD GREEN: ",
+                 "[BOLD red: ", "fire", "Active", "sunk", "<b>"]
+    rng = random.Random(seed)
+    failures = 0
+    for _ in range(count):
+        text = "".join(rng.choice(fragments) for _ in range(rng.randint(0, 24)))
+        if format_llm_output(text) != reference_format_llm_output(text):
+            failures += 1
+            if failures <= 3:
+                print(f"FAIL: output differs for {text!r}")
+    print(f"{'PASS' if not failures else 'FAIL'}: {count - failures}/{count} random texts match the reference")
+    return failures
+
+def measure_throughput(texts, repeats=20):
+    """Prints formatting throughput of the reference, single-pass and cached paths."""
+    total_bytes = sum(len(t.encode('utf-8')) for t in texts) * repeats
+    for label, formatter in [
+        ("reference", reference_format_llm_output),
+        ("single-pass", format_llm_output),
+        ("cached", format_report_html),
+    ]:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for text in texts:
+                formatter(text)
+        elapsed = time.perf_counter() - start
+        print(f"{label:>11}: {total_bytes / elapsed / 1e6:8.1f} MB/s ({elapsed * 1000:.1f} ms)")
 
 if __name__ == "__main__":
-    test_formatting()
+    failures = test_formatting()
+    failures += test_random()
+    analysis_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intelligence_analysis.json")
+    if os.path.exists(analysis_path):
+        texts = [body for reports in load_analysis(analysis_path).values() for body in reports.values()]
+        failures += test_regression(texts)
+        measure_throughput(texts)
+    print("SUCCESS" if not failures else f"FAILURE: {failures} case(s) failed")
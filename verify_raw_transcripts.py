@@ -0,0 +1,98 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from raw_transcripts import load_raw_transcripts, parse_raw_transcript
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Out of order, overlapping (a long turn spanning several short ones) and one unparseable line.
+SYNTHETIC_TRANSCRIPT = """[10.00–12.00] SPEAKER_02: Second.
+[0.00–100.00] SPEAKER_01: A long turn overlapping everything.
+[5.00–6.50] SPEAKER_02: First.
+not a diarized line
+[12.00–12.00] SPEAKER_03: Zero length.
+[11.50–30.00] SPEAKER_02: Overlaps the second.
+[40.00-45.00] SPEAKER_03: Hyphen separator.
+"""
+
+def brute_force_between(transcript, t0, t1):
+    return np.flatnonzero((transcript.start < t1) & (transcript.end > t0))
+
+def check_lookups(transcript, windows):
+    """Returns a description of the first lookup that disagrees with a linear scan, or None."""
+    for t0, t1 in windows:
+        expected = brute_force_between(transcript, t0, t1)
+        actual = transcript.between(t0, t1)
+        if not np.array_equal(actual, expected):
+            return f"{transcript.episode} between({t0}, {t1}): {actual.tolist()} != {expected.tolist()}"
+
+    speakers = np.array(transcript.table.column("speaker").to_pylist(), dtype=object)
+    for speaker_id in transcript.speakers + ["SPEAKER_UNKNOWN"]:
+        expected = np.flatnonzero(speakers == speaker_id)
+        actual = transcript.by_speaker(speaker_id)
+        if not np.array_equal(actual, expected):
+            return f"{transcript.episode} by_speaker({speaker_id}): {len(actual)} rows != {len(expected)}"
+    return None
+
+def boundary_windows(transcript, rng, count=2000):
+    """Windows starting/ending exactly on turn boundaries, inside turns (straddling) and at random."""
+    edges = np.concatenate([transcript.start, transcript.end])
+    points = np.concatenate([edges, edges + 0.005, edges - 0.005, rng.uniform(-10, edges.max() + 10, count)])
+    t0 = rng.choice(points, count)
+    t1 = t0 + rng.choice([0.0, 0.01, 1.0, 15.0, 120.0, 1e6], count)
+    return list(zip(t0.tolist(), t1.tolist())) + [(-1.0, 0.0), (edges.max(), edges.max() + 1)]
+
+def cold_parse_ms(preload=""):
+    """First and second load_raw_transcripts() in a fresh interpreter, in ms."""
+    code = (f"{preload}import time, raw_transcripts as r\n"
+            "t = time.perf_counter(); r.load_raw_transcripts(); t1 = time.perf_counter()\n"
+            "r.load_raw_transcripts(); print((t1 - t) * 1000, (time.perf_counter() - t1) * 1000)")
+    output = subprocess.run([sys.executable, "-c", code], cwd=BASE_DIR, capture_output=True, text=True, check=True)
+    return [float(value) for value in output.stdout.split()]
+
+def verify_raw_transcripts():
+    print("Testing RawTranscript.between() and by_speaker() against a linear scan...")
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "the_wargame_s9e1_transcript.txt")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(SYNTHETIC_TRANSCRIPT)
+        synthetic = parse_raw_transcript(path)
+    if len(synthetic) != 6 or not np.all(np.diff(synthetic.start) >= 0):
+        print(f"FAIL: Synthetic transcript parsed to {len(synthetic)} turns, starts {synthetic.start.tolist()}")
+        return
+    if synthetic.between(20.0, 21.0).tolist() != [0, 3]:
+        print(f"FAIL: Turns spanning [20, 21) should be the long and overlapping turns, got {synthetic.between(20.0, 21.0).tolist()}")
+        return
+
+    transcripts = load_raw_transcripts()
+    if not transcripts:
+        print("FAIL: No raw transcripts found in data/.")
+        return
+    for transcript in [synthetic, *transcripts.values()]:
+        error = check_lookups(transcript, boundary_windows(transcript, rng))
+        if error:
+            print(f"FAIL: {error}")
+            return
+    turns = sum(len(transcript) for transcript in transcripts.values())
+    print(f"Lookups match the linear scan for the synthetic transcript and {turns} turns in {len(transcripts)} episodes.")
+
+    started = time.perf_counter()
+    load_raw_transcripts()
+    print(f"Parse of all episodes in this process: {(time.perf_counter() - started) * 1000:.1f} ms")
+    first, second = cold_parse_ms()
+    print(f"Fresh interpreter: first parse {first:.1f} ms, second {second:.1f} ms")
+    first, second = cold_parse_ms("import pandas\n")
+    print(f"Fresh interpreter with pandas already imported: first parse {first:.1f} ms, second {second:.1f} ms")
+    print("(The difference is pyarrow importing pandas on its first to_numpy(); processes that already "
+          "imported it, such as the app, do not pay it.)")
+    print("SUCCESS: Time and speaker lookups agree with a brute-force scan.")
+
+if __name__ == "__main__":
+    verify_raw_transcripts()
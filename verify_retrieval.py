@@ -0,0 +1,27 @@
+import os
+
+from data_store import WargameDataStore
+
+def verify_retrieval_fallback():
+    print("Testing TranscriptRetriever.retrieve() with no lexical match...")
+    store = WargameDataStore.load(os.path.dirname(os.path.abspath(__file__)))
+    retriever = store.retriever()
+
+    retrieval = retriever.retrieve("what is it that they were", max_episode=2)
+    print(f"Retrieved {len(retrieval.rows)} segments ({retrieval.tokens} tokens): {retrieval.segment_ids[:3]}...")
+
+    if not retrieval.rows:
+        print("FAIL: No transcript context returned for a stopword-only question.")
+        return
+    if any(not segment_id.startswith("S2E2-") for segment_id in retrieval.segment_ids):
+        print(f"FAIL: Fallback context is not from the selected episode: {retrieval.segment_ids}")
+        return
+
+    matched = retriever.retrieve("nuclear deterrent", max_episode=2)
+    if not matched.rows or max(matched.scores) <= 0:
+        print("FAIL: A matching question should still be answered from BM25 hits.")
+        return
+    print("SUCCESS: Unmatched questions fall back to the latest segments of the selected episode.")
+
+if __name__ == "__main__":
+    verify_retrieval_fallback()
@@ -1,14 +1,9 @@
 import streamlit as st
 import streamlit.components.v1 as components 
-import json
 import os
 import sys
 import logging
-import re
-import base64
-import mimetypes
 import xml.etree.ElementTree as ET
-import folium
 from functools import lru_cache
 
 # --- LOGGING ---
@@ -23,7 +18,13 @@ if not os.path.exists(AGENTS_FILE_PATH):
 else:
     try:
         # Import the factory function from agents.py
-        from agents import get_agent, ADVISOR_DEFINITIONS 
+        from agents import get_agent, is_mock_output, model_backend, ADVISOR_DEFINITIONS
+        from data_store import WargameDataStore
+        from static_assets import prepare_markdown_page
+        from response_cache import ResponseCache, data_fingerprint
+        from geospatial import build_kml_map, parse_kml_placemarks, kml_content_hash
+        from analytics import ANALYTICS_FIELDS, METRICS
+        from vendor_assets import vendored_url, MERMAID_JS_URL, VIS_NETWORK_JS_URL
     except ImportError as e:
         st.error(f"FATAL: Import failed: {e}")
         st.stop()
@@ -31,24 +32,50 @@ else:
 # --- CONFIG ---
 st.set_page_config(layout="wide", page_title="AI Wargame Situation Room")
 PRECOMPUTED_FILE = "intelligence_analysis.json"
-TRANSCRIPT_VIEWER_HTML = "transcript_viewer.html"
+TRANSCRIPT_VIEWER_DIR = os.path.join("components", "transcript_viewer")
 SCENARIO_MD_FILE = "wargame_scenario.md" # Define the scenario file path
+TRANSCRIPT_VIEWER_HEIGHT = 1100 # Fixed iframe height; the viewer scrolls its own rows
+
+# Bidirectional transcript viewer: receives the corpus once (cached in the browser by
+# content hash), then only the selected episode and filter flags on each rerun.
+_transcript_viewer = components.declare_component(
+    "transcript_viewer", path=os.path.join(os.path.dirname(__file__), TRANSCRIPT_VIEWER_DIR)
+)
+TRANSCRIPT_FILTER_TYPES = ["blue", "red", "commentary", "explanation", "advertisement"]
+
+# Knowledge graph viewer: loaded once, then receives only the nodes/edges JSON for the selected episode.
+KNOWLEDGE_GRAPH_DIR = os.path.join("components", "knowledge_graph")
+KNOWLEDGE_GRAPH_HEIGHT = 800
+_knowledge_graph_viewer = components.declare_component(
+    "knowledge_graph", path=os.path.join(os.path.dirname(__file__), KNOWLEDGE_GRAPH_DIR)
+)
 
 # --- SESSION STATE ---
 if 'current_page_id' not in st.session_state:
     st.session_state.current_page_id = "Overview - Scenario" 
-if 'wargame_context' not in st.session_state:
-    st.session_state.wargame_context = []
-if 'all_transcripts' not in st.session_state:
-    st.session_state.all_transcripts = []
-if 'all_analysis' not in st.session_state:
-    st.session_state.all_analysis = {}
+# Per-session state only holds lightweight views; the transcripts and analysis
+# themselves live once per process in the shared data store (see get_data_store).
 if 'data_loaded' not in st.session_state:
     st.session_state.data_loaded = False
 if 'transcript_context_length' not in st.session_state:
     st.session_state.transcript_context_length = 0
 if 'selected_episode' not in st.session_state:
     st.session_state.selected_episode = 3
+if 'transcript_filters' not in st.session_state:
+    st.session_state.transcript_filters = {t: True for t in TRANSCRIPT_FILTER_TYPES}
+
+# --- SHARED DATA STORE ---
+@st.cache_resource
+def get_data_store():
+    """
+    Builds the read-only transcript and analysis store once per server process.
+    Every session shares this instance instead of holding its own copy of the corpus.
+    """
+    return WargameDataStore.load(os.path.dirname(__file__))
+
+def get_current_analysis():
+    """Returns the shared report mapping for the selected episode."""
+    return get_data_store().get_episode_analysis(st.session_state.selected_episode)
 
 # --- CACHED AGENT CREATION ---
 @st.cache_resource
@@ -65,11 +92,20 @@ def initialize_wargame_agent(agent_name):
         agent.start_new_session()
     return agent
 
+# --- RESPONSE CACHE ---
+@st.cache_resource(max_entries=1)
+def get_response_cache(fingerprint):
+    """
+    Shared advisor answer cache. Keyed on the prompts/transcript fingerprint, so a
+    changed input file builds a fresh cache (which also purges stale disk entries).
+    """
+    return ResponseCache(fingerprint=fingerprint)
+
 # --- NAVIGATION ---
 NAVIGATION = {
     "Overview": {
         "Scenario": {"icon": "📰", "type": "static", "file": SCENARIO_MD_FILE},
-        "Transcript": {"icon": "📖", "type": "transcript_view", "file": TRANSCRIPT_VIEWER_HTML},
+        "Transcript": {"icon": "📖", "type": "transcript_view", "file": TRANSCRIPT_VIEWER_DIR},
     },
     "Situation Room": {
         "SITREP": {"icon": "📊", "type": "llm_static"},
@@ -89,94 +125,43 @@ NAVIGATION = {
         "Citizen's Voice": {"icon": "🗣️", "type": "chatbot", "id": "citizens_voice"},
     },
     "Tools": {
-        "Knowledge Graph": {"icon": "🕸️", "type": "knowledge_graph", "file": "wargame_network.html"},
+        "Knowledge Graph": {"icon": "🕸️", "type": "knowledge_graph", "file": KNOWLEDGE_GRAPH_DIR},
+        "Search": {"icon": "🔎", "type": "search"},
+        "Analytics": {"icon": "📈", "type": "analytics"},
     }
 }
 
 def load_data_fast():
     """
-    Loads 1) Raw transcripts into a Python list of objects and 2) Precomputed Analysis JSON.
+    Ensures the shared data store is built and marks this session as loaded.
+    The store is built once per process; later sessions get the cached instance.
     """
-    # 1. Load Transcripts into a structured list
-    all_transcript_entries = []
-    data_dir = os.path.join(os.path.dirname(__file__), 'data')
-    
-    # Iterate through episodes 1 to 5
-    for i in range(1, 6):
-        filename = f"clean_transcript_s2e{i}.json"
-        path = os.path.join(data_dir, filename)
-        
-        if os.path.exists(path):
-            try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    if isinstance(data, list):
-                        all_transcript_entries.extend(data)
-                    else:
-                        logger.warning(f"Transcript file {filename} content is not a list. Skipping.")
-            except Exception as e:
-                logger.warning(f"Failed to load or parse transcript file {filename}: {e}")
-        else:
-            logger.warning(f"Transcript file not found: {path}")
-
-    # Store the full list in session state
-    st.session_state.all_transcripts = all_transcript_entries
-    
-    # 2. Load Precomputed Analysis
-    precomputed_path = os.path.join(os.path.dirname(__file__), PRECOMPUTED_FILE)
-    if os.path.exists(precomputed_path):
-        try:
-            with open(precomputed_path, 'r', encoding='utf-8') as f:
-                analysis_data = json.load(f)
-                st.session_state.all_analysis = analysis_data
-                st.session_state.data_loaded = True
-                return True
-        except Exception as e:
-            st.error(f"Error reading {PRECOMPUTED_FILE}: {e}")
-            return False
-    else:
-        logger.warning(f"Precomputed analysis file not found: {precomputed_path}")
+    store = get_data_store()
+    if not store.analysis_loaded:
+        if store.analysis_error:
+            st.error(store.analysis_error)
+        # Drop the failed build so "Retry Load" reads the files again.
+        get_data_store.clear()
         return False
 
+    st.session_state.data_loaded = True
+    return True
+
 def update_state_for_episode():
     """
     Updates the session state based on the selected episode.
-    Filters transcripts and loads the correct intelligence reports.
+    The session only keeps references into the shared store, so this never copies report text.
+    Skips all work when the selected episode has not changed since the last update.
     """
     episode = st.session_state.selected_episode
-    
-    # 1. Update Intelligence Reports
-    episode_key = f"episode_{episode}"
-    if episode_key in st.session_state.all_analysis:
-        current_analysis = st.session_state.all_analysis[episode_key]
-        for key, content in current_analysis.items():
-            st.session_state[key] = content
-    else:
-        # Fallback or clear if data missing
-        pass
-
-    # 2. Filter Transcripts
-    # Define which episodes to include for each slider position
-    # The transcript file uses "S2E1", "S2E2", "S2E3"
-    episodes_to_include = []
-    for i in range(1, episode + 1):
-        episodes_to_include.append(f"S2E{i}")
-        
-    filtered_transcripts = [
-        entry for entry in st.session_state.all_transcripts 
-        if entry.get('episode') in episodes_to_include
-    ]
-    
-    st.session_state.wargame_context = filtered_transcripts
-
-    # Calculate word count
-    total_words = 0
-    for entry in filtered_transcripts:
-        text = entry.get('text', '') or entry.get('content', '')
-        if isinstance(text, str):
-            total_words += len(text.split())
-            
-    st.session_state.transcript_context_length = total_words
+    if st.session_state.get('context_episode') == episode:
+        return
+
+    # Word counts come from the precomputed index; transcript rows are only decoded
+    # by the pages that need them (e.g. the advisor chat's retrieval index).
+    store = get_data_store()
+    st.session_state.transcript_context_length = store.word_count_up_to(episode)
+    st.session_state.context_episode = episode
 
 # --- PAGE RENDERING FUNCTIONS ---
 
@@ -190,6 +175,17 @@ def get_page_data_from_id(page_id):
         return "Overview", "Scenario", NAVIGATION["Overview"]["Scenario"]
 
 
+@st.cache_resource(max_entries=8, show_spinner=False)
+def load_static_page(full_path, mtime_ns, serve_static):
+    """
+    Processed (content, mermaid_code) for a markdown page, shared across sessions.
+    mtime_ns is part of the cache key so edits to the file are picked up. With static
+    serving enabled, images are published under content-hashed URLs the browser caches,
+    instead of being base64-inlined into every page render.
+    """
+    return prepare_markdown_page(full_path, serve_static=serve_static)
+
+
 def render_static_page(group, title, file_path):
     """Renders content from a static file (e.g., Markdown)."""
     page_data = get_page_data_from_id(st.session_state.current_page_id)[2] # Re-fetch data for icon
@@ -199,44 +195,20 @@ def render_static_page(group, title, file_path):
     try:
         # NOTE: File access should now be relative to the web_app.py script location
         full_path = os.path.join(os.path.dirname(__file__), file_path)
-        with open(full_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        # Convert local image paths in markdown to base64 to ensure they render in Docker
-        def path_to_base64(match):
-            tag_start = match.group(1)
-            img_path = match.group(2)
-            full_img_path = os.path.join(os.path.dirname(__file__), img_path)
-            try:
-                with open(full_img_path, "rb") as f:
-                    img_bytes = f.read()
-                mime_type, _ = mimetypes.guess_type(full_img_path)
-                if mime_type is None: return match.group(0) 
-                base64_str = base64.b64encode(img_bytes).decode()
-                return f'{tag_start}data:{mime_type};base64,{base64_str}"'
-            except FileNotFoundError:
-                return match.group(0)
-
-        content = re.sub(r'(<img\s[^>]*src=")([^"]+)"', path_to_base64, content, flags=re.IGNORECASE)
-
-        # --- START: MERMAID DIAGRAM RENDERING (Robust Method) ---
-        mermaid_pattern = re.compile(r'```mermaid(.*?)```', re.DOTALL)
-        match = mermaid_pattern.search(content)
-        
-        mermaid_code = ""
-        if match:
-            mermaid_code = match.group(1)
-            # Remove the mermaid block from the main content string
-            content = mermaid_pattern.sub("", content)
-        # --- END: MERMAID DIAGRAM RENDERING ---
+        # Image inlining/publishing and Mermaid extraction run once per file version;
+        # every session and rerun afterwards reuses the processed page.
+        serve_static = st.get_option("server.enableStaticServing")
+        content, mermaid_code = load_static_page(full_path, os.stat(full_path).st_mtime_ns, serve_static)
 
         # Render the main markdown content (now without the mermaid block)
         st.markdown(content, unsafe_allow_html=True)
 
-        # If mermaid code was found, render it in a dedicated component
+        # If mermaid code was found, render it in a dedicated component. Mermaid is loaded
+        # from the vendored copy on the static route when available, not from the CDN.
         if mermaid_code:
+            mermaid_src = vendored_url(MERMAID_JS_URL) if serve_static else MERMAID_JS_URL
             components.html(f"""
-                <script src="https://cdn.jsdelivr.net/npm/mermaid@10/dist/mermaid.min.js"></script>
+                <script src="{mermaid_src}"></script>
                 <pre class="mermaid">
                     {mermaid_code}
                 </pre>
@@ -251,139 +223,79 @@ def render_static_page(group, title, file_path):
 
 
 def render_transcript_page(group, title, file_path):
-    """Renders the transcript by injecting data directly into the HTML viewer."""
+    """
+    Renders the transcript through the bidirectional viewer component.
+    The full corpus is only sent when the browser reports it does not have it cached;
+    otherwise each rerun sends just the episode number and filter flags.
+    """
     page_data = get_page_data_from_id(st.session_state.current_page_id)[2] # Re-fetch data for icon
     st.header(f"{page_data['icon']} {group}: {title}")
     st.markdown("---")
 
+    full_path = os.path.join(os.path.dirname(__file__), file_path, "index.html")
+    if not os.path.exists(full_path):
+        st.error(f"Error: Transcript viewer component '{file_path}' not found.")
+        st.markdown("Please ensure `components/transcript_viewer/index.html` exists in the deployment package.")
+        return
+
     # Check if data loading was successful
-    if not st.session_state.wargame_context or not isinstance(st.session_state.wargame_context, list):
+    corpus_hash, corpus = get_data_store().transcript_corpus()
+    if not corpus["text"]:
         st.warning("Transcript data could not be loaded or is in an incorrect format.")
         return
 
-    try:
-        # Load the HTML template from the file
-        full_path = os.path.join(os.path.dirname(__file__), file_path)
-        with open(full_path, 'r', encoding='utf-8') as f:
-            html_template = f.read()
-
-        # --- DATA INJECTION ---
-        # 1. Get the data, which is a Python list of objects.
-        context_to_send = st.session_state.wargame_context
-        
-        # 2. Serialize the list into a JSON string.
-        json_string = json.dumps(context_to_send)
-
-        # 3. Replace the placeholder in the HTML.
-        html_with_data = html_template.replace(
-            '`%%TRANSCRIPT_DATA_PLACEHOLDER%%`',
-            json_string
-        )
-
-        # 4. Dynamically calculate height to avoid nested scrollbars
-        # We want the iframe to be tall enough to show all content so the user uses the main page scrollbar.
-        # Heuristic:
-        # - Header/Legend: ~400px
-        # - Per entry:
-        #   - Text wrapping: ~80 chars per line (conservative)
-        #   - Line height: ~25px
-        #   - Padding/Margin: ~20px
-        
-        estimated_height = 400 
-        chars_per_line = 80
-        line_height_px = 25
-        entry_padding_px = 20
-
-        for entry in context_to_send:
-            text = entry.get('text', '')
-            if text:
-                # Calculate number of visual lines this text might take
-                num_visual_lines = (len(text) // chars_per_line) + 1
-                entry_height = (num_visual_lines * line_height_px) + entry_padding_px
-                estimated_height += entry_height
-
-        # Add a little extra buffer just in case
-        estimated_height += 100
-
-        # 5. Embed the HTML component with the data now included.
-        components.html(
-            html_with_data,
-            height=estimated_height, 
-            scrolling=False # Disable iframe scrolling so we rely on the main page scroll
-        )
+    # The component value reports which corpus the browser holds (or needs).
+    viewer_state = st.session_state.get("transcript_viewer_state") or {}
+    send_corpus = viewer_state.get("need_corpus") == corpus_hash
+
+    viewer_state = _transcript_viewer(
+        corpus_hash=corpus_hash,
+        corpus=corpus if send_corpus else None,
+        episode=st.session_state.selected_episode,
+        filters=st.session_state.transcript_filters,
+        height=TRANSCRIPT_VIEWER_HEIGHT,
+        key="transcript_viewer_state",
+        default=None,
+    )
 
-    except FileNotFoundError:
-        st.error(f"Error: Transcript viewer HTML file '{file_path}' not found.")
-        st.markdown("Please ensure `transcript_viewer.html` exists in the deployment package.")
+    if viewer_state and viewer_state.get("filters"):
+        st.session_state.transcript_filters = viewer_state["filters"]
 
 
 def render_knowledge_graph(group, title, file_path):
     """
-    Renders the knowledge graph by embedding the HTML file directly.
+    Renders the knowledge graph as of the selected episode. The graph is assembled from
+    per-episode deltas in the shared data store; the viewer component receives only its
+    nodes and edges.
     """
     page_data = get_page_data_from_id(st.session_state.current_page_id)[2] # Re-fetch data for icon
     st.header(f"{page_data['icon']} {group}: {title}")
     st.markdown("---")
 
-    try:
-        # Load the HTML template from the file
-        full_path = os.path.join(os.path.dirname(__file__), file_path)
-        with open(full_path, 'r', encoding='utf-8') as f:
-            html_template = f.read()
-
-        # Embed the HTML component
-        st.info("The Knowledge Graph is interactive. Scroll within the viewer to explore the network.")
-        components.html(
-            html_template,
-            height=800, 
-            scrolling=True 
-        )
-        
-    except FileNotFoundError:
-        st.error(f"Error: Knowledge Graph HTML file '{file_path}' not found.")
-        st.markdown("Please ensure `wargame_network.html` exists in the deployment package.")
-
-
-def format_llm_output(text):
-    """
-    Formats raw LLM output by replacing custom tags with HTML styles.
-    Target tags: [**BOLD RED: ...**] and [**BOLD GREEN: ...**]
-    Fallback: Colors **Text** red/green based on keywords.
-    """
-    if not isinstance(text, str):
-        return str(text)
-
-    # 1. Primary Method: Explicit Tags
-    def replace_tag_match(match):
-        color_name = match.group(1).upper()
-        content = match.group(2)
-        color_code = "#cc3333" if color_name == "RED" else "#28a745"
-        return f'<span style="color: {color_code}; font-weight: bold;">{content}</span>'
-
-    pattern_tags = r"\[(?:\*\*)?BOLD (RED|GREEN): (.*?)(?:\*\*)?\]"
-    text = re.sub(pattern_tags, replace_tag_match, text)
-
-    # 2. Fallback Method: Keyword Matching in Bold Text
-    # Matches: **Text**
-    def replace_keyword_match(match):
-        content = match.group(1)
-        lower_content = content.lower()
-        
-        # Keywords for RED (Bad status)
-        if any(w in lower_content for w in ['damaged', 'destroyed', 'sunk', 'crippled', 'fire', 'casualt']):
-            color_code = "#cc3333" 
-        # Keywords for GREEN (Good status)
-        elif any(w in lower_content for w in ['operational', 'transit', 'active', 'deployed']):
-            color_code = "#28a745" 
-        else:
-            return match.group(0) # No change
-            
-        return f'<span style="color: {color_code}; font-weight: bold;">{content}</span>'
+    full_path = os.path.join(os.path.dirname(__file__), file_path, "index.html")
+    if not os.path.exists(full_path):
+        st.error(f"Error: Knowledge Graph component '{file_path}' not found.")
+        st.markdown("Please ensure `components/knowledge_graph/index.html` exists in the deployment package.")
+        return
 
-    pattern_keywords = r"\*\*(.*?)\*\*"
-    text = re.sub(pattern_keywords, replace_keyword_match, text)
+    graph = get_data_store().knowledge_graph(st.session_state.selected_episode)
+    if graph is None:
+        st.warning("Knowledge graph data not found. Run `python knowledge_graph.py` to generate it.")
+        return
 
-    return text
+    graph_hash, graph_data = graph
+    # vis-network is loaded from the vendored copy on the static route when available
+    vis_network_url = vendored_url(VIS_NETWORK_JS_URL) if st.get_option("server.enableStaticServing") else VIS_NETWORK_JS_URL
+    st.info("The Knowledge Graph is interactive. Scroll within the viewer to explore the network.")
+    _knowledge_graph_viewer(
+        graph_hash=graph_hash,
+        graph=graph_data,
+        episode=st.session_state.selected_episode,
+        vis_network_url=vis_network_url,
+        height=KNOWLEDGE_GRAPH_HEIGHT,
+        key="knowledge_graph_viewer",
+        default=None,
+    )
 
 
 def render_llm_static_page(group, title):
@@ -393,10 +305,11 @@ def render_llm_static_page(group, title):
     st.markdown("---")
     
     cache_key = f"report_{title}"
+    # Formatted HTML is pre-rendered into the bundle or formatted once per process,
+    # keyed by report content, so reruns and other sessions reuse it.
+    formatted_content = get_data_store().get_report_html(st.session_state.selected_episode, cache_key)
     
-    if cache_key in st.session_state:
-        # Format the content to replace custom tags with HTML
-        formatted_content = format_llm_output(st.session_state[cache_key])
+    if formatted_content is not None:
         st.markdown(formatted_content, unsafe_allow_html=True)
     else:
         st.warning("Intelligence data not found. Ensure precompute_intelligence.py has been run and the data is loaded.")
@@ -411,79 +324,28 @@ def render_geospatial_page(group, title):
     st.header(f"{page_data['icon']} {group}: {title}")
     st.markdown("---")
 
-    # Retrieve KML content from session state
+    # Retrieve KML content from the shared store
     # The key in intelligence_analysis.json is "report_Geospatial"
-    kml_content = st.session_state.get("report_Geospatial")
+    kml_content = get_current_analysis().get("report_Geospatial")
 
     if not kml_content:
         st.info("No Geospatial intelligence available for this episode.")
         return
 
     try:
-        # Parse KML
-        # Remove any leading whitespace/newlines before parsing
-        kml_content = kml_content.strip()
-        root = ET.fromstring(kml_content)
-        
-        # Namespace handling
-        namespace = {'kml': 'http://www.opengis.net/kml/2.2'}
-        
-        # Initialize Map - Default to UK view
-        m = folium.Map(location=[54.5, -3.0], zoom_start=6, tiles="OpenStreetMap")
-        
-        # Extract Placemarks
-        placemarks = root.findall('.//kml:Placemark', namespace)
-        
-        markers_added = False
-        all_coords = []
-
-        for placemark in placemarks:
-            # Extract Name
-            name_tag = placemark.find('kml:name', namespace)
-            name = name_tag.text if name_tag is not None else "Unknown Location"
-
-            # Extract Description
-            desc_tag = placemark.find('kml:description', namespace)
-            description = desc_tag.text if desc_tag is not None else ""
-
-            # Extract Coordinates
-            point = placemark.find('.//kml:Point/kml:coordinates', namespace)
-            if point is not None:
-                coords_str = point.text.strip()
-                try:
-                    # KML is Longitude,Latitude,Altitude
-                    lon_str, lat_str, _ = coords_str.split(',')
-                    lat = float(lat_str)
-                    lon = float(lon_str)
-                    
-                    all_coords.append([lat, lon])
-
-                    # Create a marker
-                    folium.Marker(
-                        location=[lat, lon],
-                        popup=folium.Popup(f"<b>{name}</b><br>{description}", max_width=300),
-                        tooltip=name,
-                        icon=folium.Icon(color="red", icon="info-sign")
-                    ).add_to(m)
-                    markers_added = True
-                except ValueError:
-                    logger.warning(f"Skipping placemark '{name}': Invalid coordinates format.")
-
-        if markers_added:
-            st.success(f"Identified {len(all_coords)} tactical locations.")
-            # Fit bounds to show all markers
-            if all_coords:
-                m.fit_bounds(all_coords)
-            
-            # Render the map
-            # We use _html to get the raw HTML representation of the map and embed it
-            # This avoids needing streamlit-folium if we just want a static-ish interactive map
-            # But streamlit-folium is better for interactivity. 
-            # Since I didn't add streamlit-folium to requirements (I added folium), I will use components.html
-            
-            map_html = m._repr_html_()
+        # Parsed placemarks and the rendered map are cached by KML content hash and shared
+        # across sessions, so switching episodes or reopening GEOINT is a lookup.
+        # The bundle may already hold a map pre-rendered at compile time; it references the
+        # vendored map libraries, so it is only used when the static route is served.
+        serve_static = st.get_option("server.enableStaticServing")
+        placemarks = parse_kml_placemarks(kml_content)
+        map_html = get_data_store().get_asset(f"maps/{kml_content_hash(kml_content)}") if serve_static else None
+        if map_html is None:
+            placemarks, map_html = build_kml_map(kml_content, vendored=serve_static)
+
+        if placemarks:
+            st.success(f"Identified {len(placemarks)} tactical locations.")
             components.html(map_html, height=600)
-            
         else:
             st.warning("No valid locations found in the KML data.")
 
@@ -503,11 +365,12 @@ def render_chatbot_page(agent_name):
     key_with_space = f"briefing_{agent_name}"
     key_with_underscore = f"briefing_{agent_name.replace(' ', '_')}"
     
+    current_analysis = get_current_analysis()
     briefing_content = None
-    if key_with_space in st.session_state:
-        briefing_content = st.session_state[key_with_space]
-    elif key_with_underscore in st.session_state:
-        briefing_content = st.session_state[key_with_underscore]
+    if key_with_space in current_analysis:
+        briefing_content = current_analysis[key_with_space]
+    elif key_with_underscore in current_analysis:
+        briefing_content = current_analysis[key_with_underscore]
 
     if briefing_content:
         with st.expander("📜 Initial Strategic Assessment", expanded=True):
@@ -524,6 +387,8 @@ def render_chatbot_page(agent_name):
     for msg in st.session_state[history_key]:
         with st.chat_message(msg["role"]):
             st.markdown(msg["content"])
+            if msg.get("sources"):
+                st.caption(f"Sources: {', '.join(msg['sources'])}")
             
     # Handle user input
     if prompt := st.chat_input(f"Ask {agent_name}..."):
@@ -532,18 +397,145 @@ def render_chatbot_page(agent_name):
             st.markdown(prompt)
             
         with st.chat_message("assistant"):
-            with st.spinner(f"{agent_name} is synthesizing intelligence..."):
-                # Use the internal ID if available, otherwise fallback to the name
-                agent_id = page_data.get('id', agent_name)
-                agent = initialize_wargame_agent(agent_id)
-                
-                if agent:
-                    # Pass the full wargame context to the agent
-                    response = agent.get_response(prompt, context_text=st.session_state.wargame_context)
+            # Use the internal ID if available, otherwise fallback to the name
+            agent_id = page_data.get('id', agent_name)
+            agent = initialize_wargame_agent(agent_id)
+            
+            if agent:
+                # Only the transcript segments relevant to the question (plus their
+                # neighbours, within a token budget) are sent, not the whole history.
+                retriever = get_data_store().retriever()
+                retrieval = retriever.retrieve(prompt, max_episode=st.session_state.selected_episode)
+
+                # Repeated questions to the same advisor at the same episode are answered
+                # from the shared cache without calling the model. Mock-mode placeholders are
+                # not cached, so they are never served once a live model is enabled.
+                response_cache = get_response_cache(data_fingerprint(model_id=model_backend()))
+                cache_key = response_cache.make_key(agent_id, st.session_state.selected_episode, prompt, agent.system_prompt)
+                response = response_cache.get(cache_key)
+                if response is not None:
                     st.markdown(response)
-                    st.session_state[history_key].append({"role": "assistant", "content": response})
                 else:
-                    st.error("Agent connection failed. Check Vertex AI initialization.")
+                    # Render the answer chunk by chunk as it streams in, rather than behind a spinner.
+                    response = st.write_stream(
+                        agent.stream_response(prompt, context_text=retriever.records(retrieval))
+                    )
+                    if not is_mock_output(response):
+                        response_cache.put(cache_key, response)
+                if retrieval.segment_ids:
+                    st.caption(f"Sources: {', '.join(retrieval.segment_ids)}")
+                st.session_state[history_key].append(
+                    {"role": "assistant", "content": response, "sources": retrieval.segment_ids}
+                )
+            else:
+                st.error("Agent connection failed. Check Vertex AI initialization.")
+
+
+def render_search_page(group, title):
+    """
+    Full-text search over every transcript segment and report/briefing body, up to the
+    selected episode. The inverted index is built once per process in the shared data store.
+    """
+    page_data = get_page_data_from_id(st.session_state.current_page_id)[2] # Re-fetch data for icon
+    st.header(f"{page_data['icon']} {group}: {title}")
+    st.markdown("---")
+
+    index = get_data_store().search_index()
+    episode = st.session_state.selected_episode
+    episode_options = [value for value in index.options("episode") if value <= episode]
+    # Drop episodes picked earlier that are now after the selected one
+    if "search_episode" in st.session_state:
+        st.session_state.search_episode = [value for value in st.session_state.search_episode if value <= episode]
+    query = st.text_input(
+        "Search transcripts and reports",
+        key="search_query",
+        placeholder='e.g. "prime minister" nuclear',
+        help='Every word must match; wrap words in double quotes to match an exact phrase.',
+    )
+
+    col1, col2, col3, col4 = st.columns(4)
+    filters = {
+        "source": col1.multiselect("Source", index.options("source"), key="search_source"),
+        "episode": col2.multiselect("Episode", episode_options, key="search_episode"),
+        "classification": col3.multiselect("Classification", index.options("classification"), key="search_classification"),
+        "speaker": col4.multiselect("Speaker", index.options("speaker"), key="search_speaker"),
+    }
+
+    if not query.strip():
+        st.caption(f"{index.num_docs:,} documents indexed. Searching episodes 1-{episode}.")
+        return
+
+    results = index.search(query, up_to_episode=episode, **filters)
+    st.caption(f"{results.total:,} matches ({results.elapsed_ms:.1f} ms)")
+    with st.expander("Matches by facet"):
+        for field, counts in results.facets.items():
+            if counts:
+                st.caption(f"**{field.title()}**: " + ", ".join(f"{value} ({count})" for value, count in counts.items()))
+
+    for hit in results.hits:
+        document = hit.document
+        label = document.doc_id if document.source == "transcript" else document.title
+        details = [f"Episode {document.episode}", document.source]
+        details += [value for value in (document.speaker, document.classification) if value]
+        st.markdown(f"**{label}** · {' · '.join(details)}")
+        # The snippet is escaped HTML; st.html keeps markdown syntax in transcripts (**, #, 1.) literal.
+        st.html(f"<div>{hit.snippet}</div>")
+
+
+ANALYTICS_TOP_CATEGORIES = 12 # Charts show the largest categories; the rest are summed as "Other"
+
+def render_analytics_page(group, title):
+    """
+    Airtime dashboard by speaker, role and classification. All aggregates are precomputed
+    per episode in the shared data store; this page only slices and sums those small tables.
+    """
+    page_data = get_page_data_from_id(st.session_state.current_page_id)[2] # Re-fetch data for icon
+    st.header(f"{page_data['icon']} {group}: {title}")
+    st.markdown("---")
+
+    analytics = get_data_store().analytics()
+    episode = st.session_state.selected_episode
+
+    col1, col2, col3 = st.columns(3)
+    field = col1.selectbox("Breakdown", list(ANALYTICS_FIELDS), format_func=ANALYTICS_FIELDS.get, key="analytics_field")
+    metric = col2.radio("Measure", METRICS, horizontal=True, format_func=str.title, key="analytics_metric")
+    scope = col3.radio("Scope", ["Selected episode", "Episodes to date"], horizontal=True, key="analytics_scope")
+    if scope == "Selected episode":
+        totals = analytics.totals(field, episode=episode)
+        distribution = analytics.turn_length_distribution(episode=episode)
+        st.caption(f"Episode {episode}")
+    else:
+        totals = analytics.totals(field, up_to_episode=episode)
+        distribution = analytics.turn_length_distribution(up_to_episode=episode)
+        st.caption(f"Episodes 1-{episode}")
+
+    # Keep the per-episode charts readable when there are many speakers or roles.
+    top = list(totals.sort_values(metric, ascending=False).index[:ANALYTICS_TOP_CATEGORIES])
+    per_episode = analytics.by_episode(field, metric)
+    per_episode = per_episode.loc[per_episode.index <= episode]
+    other = per_episode.drop(columns=top).sum(axis=1)
+    per_episode = per_episode[top]
+    if other.any():
+        per_episode = per_episode.assign(Other=other)
+    per_episode.index = per_episode.index.map(lambda ep: f"Episode {ep}")
+
+    left, right = st.columns(2)
+    with left:
+        st.subheader(f"{metric.title()} per episode")
+        st.bar_chart(per_episode)
+    with right:
+        st.subheader(f"Cumulative {metric}")
+        st.line_chart(per_episode.cumsum())
+
+    st.subheader(f"{ANALYTICS_FIELDS[field]} totals")
+    st.dataframe(
+        totals,
+        column_config={"share": st.column_config.ProgressColumn("Share of words", format="%.2f", min_value=0, max_value=1)},
+    )
+
+    st.subheader("Speaking turn lengths")
+    st.caption("Turns are runs of consecutive segments by the same speaker, grouped by words per turn.")
+    st.bar_chart(distribution)
 
 
 # --- SIDEBAR ---
@@ -585,6 +577,21 @@ with st.sidebar:
     if st.session_state.data_loaded:
         update_state_for_episode()
 
+    # Memory sizing: the shared store is paid once per process, each session adds only its view.
+    if st.session_state.data_loaded:
+        with st.expander("📈 Memory Footprint"):
+            store = get_data_store()
+            shared_mb = store.memory_bytes() / 1e6
+            session_kb = store.session_memory_bytes(st.session_state.items()) / 1e3
+            st.caption(f"Shared data store (per process): {shared_mb:.2f} MB")
+            st.caption(f"This session: {session_kb:.1f} KB")
+            st.caption(f"Estimate for 50 sessions: {shared_mb + 50 * session_kb / 1e3:.2f} MB")
+            cache_stats = get_response_cache(data_fingerprint(model_id=model_backend())).stats()
+            st.caption(
+                f"Advisor response cache: {cache_stats['memory_hits'] + cache_stats['disk_hits']} hits / "
+                f"{cache_stats['misses']} misses ({cache_stats['disk_entries']} stored)"
+            )
+
     st.markdown("---")
 
     # Navigation Menu
@@ -623,6 +630,10 @@ elif page_type == 'chatbot':
     render_chatbot_page(current_page_title)
 elif page_type == 'geospatial':
     render_geospatial_page(page_group, current_page_title)
+elif page_type == 'search':
+    render_search_page(page_group, current_page_title)
+elif page_type == 'analytics':
+    render_analytics_page(page_group, current_page_title)
 
 # If the page type is unexpected (shouldn't happen with the current logic), default to Scenario
 else: